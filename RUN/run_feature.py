@@ -1,30 +1,22 @@
 import os, sys
+import multiprocessing
 import numpy as np
 #root
 from parameter import PM
 from repertory import primary_feature
 from io_file   import File_oprate
-from io_file.Write import write_data
+from io_file.Write import write_row
 ###Global variable
 pathway = '/p/project/lmcat/wenxu/jobs/descriptor/dos/dos_Ir'
 rutile_type = 'Iro2'
+list_name = ('Ni','Cu','Zn','Ag','Fe','Co',
+             'Ti','W', 'Mo','Mn','Ru','Ir')
 
 #########################################################
 #                        File opration                  #
 #########################################################
-folnames=os.listdir(pathway)
-folnames.sort()
-for folname in folnames: 
-    list_name=['Ni','Cu','Zn','Ag','Fe','Co',
-               'Ti','W', 'Mo','Mn','Ru','Ir']
-    for startname in list_name:
-        judge_folder=False
-        if  folname.startswith('{}'.format(startname)):
-            judge_folder=True
-            break
-    if  judge_folder == False:
-        print('{} is not the working folder'.format(folname))
-    else:
+def process_folder(folname):
+        ###runs in a worker process, so the chdir does not affect other folders (only Bader_charge still needs it)
         print(folname)
         os.chdir('{}/{}'.format(pathway,folname))
         met,site=File_oprate.split_name(folname)
@@ -39,21 +31,14 @@ for folname in folnames:
      #   Max_2p_band=obj_dos.Max_2p_band()
      #   O2p_fermi=obj_dos.O2p_fermi()
      #   formation_energy=primary_feature.Formation_energy(pathway,folname,rutile_type)
-     #   write_data('/p/project/lmcat/wenxu/data/feature',folname,formation_energy, O2p_band_center, O2p_band_filling, Max_2p_band, O2p_fermi, un_dbc)
+     #   return folname, [formation_energy, O2p_band_center, O2p_band_filling, Max_2p_band, O2p_fermi, un_dbc]
      #   #gourp geometry
-     #   obj_Geomerty=primary_feature.Geometry(site)
+     #   obj_Geomerty=primary_feature.Geometry(site,pathway='{}/{}'.format(pathway,folname))
      #   obj_Geomerty.Variable()
-     #   Near_1 =obj_Geomerty.Nearest_metal()[0]
-     #   Near_2 =obj_Geomerty.Nearest_metal()[1]
-     #   Near_3 =obj_Geomerty.Nearest_metal()[2]
+     #   Near_1, Near_2, Near_3 = obj_Geomerty.Nearest_metal()
      #   O_1fold =obj_Geomerty.Site_1fold()
      #   Rela_dis = obj_Geomerty.Relative_distance()
-     #   Local_1=obj_Geomerty.Spherical_hamonics()[0]
-     #   Local_2=obj_Geomerty.Spherical_hamonics()[1]
-     #   Local_3=obj_Geomerty.Spherical_hamonics()[2]
-     #   Local_4=obj_Geomerty.Spherical_hamonics()[3]
-     #   Local_5=obj_Geomerty.Spherical_hamonics()[4]
-     #   Local_6=obj_Geomerty.Spherical_hamonics()[5]
+     #   Local_1, Local_2, Local_3, Local_4, Local_5, Local_6 = obj_Geomerty.Spherical_hamonics()
      #   #group dos
         obj_dos=primary_feature.DOS_extract(site,met,pathway='{}/{}'.format(pathway,folname))
         obj_dos.dos_collect()
@@ -61,10 +46,8 @@ for folname in folnames:
      #   dbc=obj_dos.D_band_center()[0]
      #   dbw=obj_dos.D_band_width()
         dbs=obj_dos.D_band_skewness()
-        write_data('/p/project/lmcat/wenxu/data/feature',folname,dbs)
      #   dbk=obj_dos.D_band_kutosis()
-     #   d_band_filling=obj_dos.D_band_filling()[0]
-     #   fraction_unfilling=obj_dos.D_band_filling()[1]
+     #   d_band_filling, fraction_unfilling = obj_dos.D_band_filling()
      #   Eg_band_center=obj_dos.Eg_band_center()[0]
      #   Eg_band_filling=obj_dos.Eg_band_filling()
      #   T2g_band_center=obj_dos.T2g_band_center()[0]
@@ -76,14 +59,8 @@ for folname in folnames:
      #   
      #   Ef = primary_feature.Fermi_level(pathway,folname)
      #   WF = primary_feature.Work_function(site,Ef,pathway='{}/{}'.format(pathway,folname))
-     #   PE = primary_feature.Atomic_feature(met,site,rutile_type)[0]
-     #   IE = primary_feature.Atomic_feature(met,site,rutile_type)[1]
-     #   EA = primary_feature.Atomic_feature(met,site,rutile_type)[2]
-     #   radius= primary_feature.Atomic_feature(met,site,rutile_type)[3]
-     #   Vad2= primary_feature.Atomic_feature(met,site,rutile_type)[4]
-     #   bader_charge = primary_feature.Bader_charge(met,site,rutile_type)[0]
-     #   aver_metal = primary_feature.Bader_charge(met,site,rutile_type)[1]
-     #   aver_Oxygen = primary_feature.Bader_charge(met,site,rutile_type)[2]
+     #   PE, IE, EA, radius, Vad2 = primary_feature.Atomic_feature(met,site,rutile_type)[:5]
+     #   bader_charge, aver_metal, aver_Oxygen = primary_feature.Bader_charge(met,site,rutile_type)
      #   
      #  # print 'Nearest_metal', Nearest_M
      #  # print 'Site_1fold', O_1fold
@@ -108,9 +85,24 @@ for folname in folnames:
      #  # print 'bader_charge', bader_charge
      #  # print 'bader_aver_metal',aver_metal
      #  # print 'bader_aver_Oxygen',aver_Oxygen
-     #   write_data('/p/project/lmcat/wenxu/data/feature',folname, O_1fold, Rela_dis, Near_1, Near_2, Near_3, Local_1, Local_2, Local_3, Local_4, Local_5, Local_6,
+     #   return folname, [O_1fold, Rela_dis, Near_1, Near_2, Near_3, Local_1, Local_2, Local_3, Local_4, Local_5, Local_6,
      #                                                             Max_d, dbc, dbw, dbk, d_band_filling, fraction_unfilling, Eg_band_center, Eg_band_filling, T2g_band_center,
      #                                                             T2g_band_filling, Dos_fermi, O2p_band_center, O2p_band_filling, WF, PE, IE, EA, radius, Vad2,
-     #                                                             bader_charge, aver_metal, aver_Oxygen)
-    os.chdir(pathway)
+     #                                                             bader_charge, aver_metal, aver_Oxygen]
+        os.chdir(pathway)
+        return folname, [dbs]
+
+if __name__ == '__main__':
+    #str.startswith accepts a tuple, so one call checks every metal prefix
+    folnames=[folname for folname in os.listdir(pathway) if folname.startswith(list_name)]
+    folnames.sort()
+    #folders are independent: compute them in parallel, write the results in folder order from here
+    with open('/p/project/lmcat/wenxu/data/feature','a',buffering=1<<20) as output_file:
+        pool = multiprocessing.Pool()
+        try:
+            for folname, features in pool.imap(process_folder, folnames):
+                write_row(output_file,folname,*features)
+        finally:
+            pool.close()
+            pool.join()
 
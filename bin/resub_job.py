@@ -1,11 +1,13 @@
 #!/usr/bin/env python
 import os,sys
+import shutil
+import subprocess
 from io_file import Write
 
 current_dir = os.getcwd()
 #copy original trajctory file
-if os.path.exists('opt.traj') == True: 
-   os.system('cp opt.traj copy_opt.tray')
+if os.path.isfile('opt.traj'):
+   shutil.copyfile('opt.traj','copy_opt.traj')
 else:
    print (" NO EXIST OPT.TRAJ FILE")
 ##writing reopt_str.py file
@@ -25,5 +27,5 @@ fname=current_dir+"/sub_job"
 newname=current_dir+"/resub_job"
 Write.write_final_line(fname,newname,"python restr_opt.py")
 ## submission
-os.system("sbatch resub_job")
+subprocess.check_call(["sbatch","resub_job"])
 
@@ -4,11 +4,10 @@ a=np.loadtxt('overall2.dat',dtype=('|S25'))
 y=[1]*194 + [2]*195 + [3]*191
 #y=[1]*189 + [2]*195
 sfolder = StratifiedKFold(n_splits=5,shuffle=True)
-train_list=[]; test_list=[]
-for train, test in sfolder.split(a,y):
-    train_list.append(train)
-    test_list.append(test)
-for index, i in enumerate(range(1,6)):
-    np.savetxt("train{}.py".format(i),a[train_list[index]],fmt="%s") 
-    np.savetxt("test{}.py".format(i),a[test_list[index]],fmt="%s")
+#a holds raw byte strings, so join the rows once and write each fold in one call
+for i, (train, test) in enumerate(sfolder.split(a,y),1):
+    with open("train{}.py".format(i),'wb') as outfile:
+        outfile.write(b"\n".join(b" ".join(row) for row in a[train]) + b"\n")
+    with open("test{}.py".format(i),'wb') as outfile:
+        outfile.write(b"\n".join(b" ".join(row) for row in a[test]) + b"\n")
 
@@ -1,8 +1,32 @@
 #!/usr/bin/env python
 import os,sys
+from collections import deque
 import numpy as np
 from ase import Atoms,Atom
 from ase.io import read,write
+try:
+    from numba import njit
+except ImportError:
+    def njit(func):
+        return func
+
+@njit
+def coord_scan(positions,anchor,cutoff):
+    ###distance of every atom to anchor, keep the ones inside cutoff (no pbc, same as atoms.get_distance)
+    n_atoms=positions.shape[0]
+    indexs=np.empty(n_atoms,dtype=np.int64)
+    distances=np.empty(n_atoms)
+    count=0
+    for index in range(n_atoms):
+        dx=positions[index,0]-anchor[0]
+        dy=positions[index,1]-anchor[1]
+        dz=positions[index,2]-anchor[2]
+        length=np.sqrt(dx*dx+dy*dy+dz*dz)
+        if length <= cutoff and length != 0.0:
+           indexs[count]=index
+           distances[count]=length
+           count+=1
+    return indexs[:count], distances[:count]
 
 class Adsorbate:
       ads_indices =  {   #(active_site,ending_atoms,others_adsatoms,others) 
@@ -34,34 +58,28 @@ class Adsorbate:
                             }
                       }
   
-      def __init__(self,kind,site):
+      def __init__(self,kind,site,atoms):
           self.kind=kind
           self.site=site
           self.ads_indice=self.ads_indices[self.kind][self.site]
+          ###read positions and symbols once, reused by angle, bond and coordination
+          self.positions=atoms.get_positions()
+          self.symbols=np.array(atoms.get_chemical_symbols())
       def cal_angle(self):
           #ads_indice = self.ads_indices[self.kind][self.site]    ###self.ads_indices
-          vector1=atoms[self.ads_indice[1]].position-atoms[self.ads_indice[0]].position
-          vector2=np.array([0,0,1])
-          L1=np.sqrt(vector1.dot(vector1))
-          L2=np.sqrt(vector2.dot(vector2))
-          cos_angle=vector1.dot(vector2)/(L1*L2)
-          angle=90-np.arccos(cos_angle)*360/2/np.pi     ###radian*360/2/np.pi=angle
+          vx,vy,vz=self.positions[self.ads_indice[1]]-self.positions[self.ads_indice[0]]
+          ###angle between bond and surface plane: 90-arccos(vz/L) == arctan2(vz, in-plane length)
+          angle=np.degrees(np.arctan2(vz,np.hypot(vx,vy)))
           return round(angle,2) #,self.ads_indice[1],self.ads_indice[0]
       def cal_bond(self):
           ## the first two index are used to cal length
-          return round(atoms.get_distance(self.ads_indice[1],self.ads_indice[0]),3)
+          return round(np.linalg.norm(self.positions[self.ads_indice[1]]-self.positions[self.ads_indice[0]]),3)
       def cal_coordinat(self):
-          indexs=[]
-          symbols=[]
-          distances=[]
-          count=0
-          for index in range(len(atoms)):
-              length=atoms.get_distance(self.ads_indice[1],index)
-              if length <= 2.5 and length != 0.0:
-                 count+=1
-                 indexs.append(index)  
-                 symbols.append(atoms[index].symbol)
-                 distances.append(round(length,3))    ###round(a,3) specify digit
+          indexs,lengths=coord_scan(self.positions,self.positions[self.ads_indice[1]],2.5)
+          count=len(indexs)
+          symbols=self.symbols[indexs].tolist()
+          indexs=[int(index) for index in indexs]
+          distances=[round(float(length),3) for length in lengths]    ###round(a,3) specify digit
           sum_list=list(zip(symbols,distances))
           dictionary=dict(zip(indexs,sum_list))
           return count, dictionary
@@ -69,29 +87,27 @@ class Adsorbate:
 
 def read_data(output_name):
     with open('{}'.format(output_name),'r') as input_file:
-         lines=input_file.readlines()
+         ###stream the file and only keep the last line in memory
+         lines=deque(input_file,maxlen=1)
          if len(lines) < 1:
             line=0
          else:
             line =lines[-1].split()
          return line
 
-def write_data(filename,folname,line,pathway,state,judge_spin,bond_calculation,angle_calculation,coordinate_calculation):
-    os.chdir('/naslx/projects/pr47fo/ge39luv2/data')
-    with open('{}'.format(filename),'a') as output_file:   ####mode 'a' means add content at the end of file
-         output_file.write(' {0:17}{1:16}{2:8}{3:16}{4:8}{5:4}{6:7}{7:25}\n'.format(folname,line[-2],line[-1],state,judge_spin,bond_calculation,angle_calculation,coordinate_calculation))
-         os.chdir(pathway)
+def write_data(output_file,folname,line,state,judge_spin,bond_calculation,angle_calculation,coordinate_calculation):
+    ###output_file is opened once by the caller and shared by all folders
+    output_file.write(' {0:17}{1:16}{2:8}{3:16}{4:8}{5:4}{6:7}{7:25}\n'.format(folname,line[-2],line[-1],state,judge_spin,bond_calculation,angle_calculation,coordinate_calculation))
 
 def check_spin(strings1,strings2,pathway):
+    ###both scans stop at the first match, the log is only read once
     judge_spin='NoSpin'
-    with open('{}/pw.inp'.format(pathway), 'r') as input_file:
-         for line in input_file:
-             if strings1 in line:
-                with open('{}/log'.format(pathway), 'r') as input_file2:
-                     for line2 in input_file2:
-                         if strings2 in line2:
-                            judge_spin='Spin'
-                            break
+    with open('{}/pw.inp'.format(pathway), 'rb') as input_file:
+         spin_input=any(strings1.encode() in line for line in input_file)
+    if spin_input:
+       with open('{}/log'.format(pathway), 'rb') as input_file2:
+            if any(strings2.encode() in line2 for line2 in input_file2):
+               judge_spin='Spin'
     return judge_spin
 
 
@@ -108,59 +124,60 @@ def split_name(folname):
 pathway=os.getcwd()
 folnames=os.listdir(pathway)
 folnames.sort()
-for folname in folnames:
-    os.chdir(folname)
-    output_name=False
-    ads_object=0
-    angle_calculation=0
-    bond_calculation=0
-    coordinate_calculation=0
-    try:
-        atoms=read('opt.traj')
-        ads_object=Adsorbate(*split_name(folname[2:]))
-        angle_calculation=ads_object.cal_angle()
-        bond_calculation=ads_object.cal_bond()
-        coordinate_calculation=ads_object.cal_coordinat()
-    except:
-        print(folname +' without 1 relaxzation')
-
-    if os.path.exists('2x1x4.log'):
-       output_name='2x1x4.log'
-       line=read_data('2x1x4.log')
-       if line==0:
-           state='SCF failed'
-           line=[0.000000,0.000000]
-       else:
-           if float(line[-1]) <= 0.03:
-              state='conver success'
+with open('/naslx/projects/pr47fo/ge39luv2/data/result','a') as output_file:   ####mode 'a' means add content at the end of file
+    for folname in folnames:
+        folder='{}/{}'.format(pathway,folname)
+        output_name=False
+        ads_object=0
+        angle_calculation=0
+        bond_calculation=0
+        coordinate_calculation=0
+        try:
+            atoms=read('{}/opt.traj'.format(folder))
+            ads_object=Adsorbate(*split_name(folname[2:]),atoms=atoms)
+            angle_calculation=ads_object.cal_angle()
+            bond_calculation=ads_object.cal_bond()
+            coordinate_calculation=ads_object.cal_coordinat()
+        except:
+            print(folname +' without 1 relaxzation')
+
+        if os.path.exists('{}/2x1x4.log'.format(folder)):
+           output_name='2x1x4.log'
+           line=read_data('{}/2x1x4.log'.format(folder))
+           if line==0:
+               state='SCF failed'
+               line=[0.000000,0.000000]
            else:
-               state='force failed'
-    if os.path.exists('relax.log'):
-       output_name='relax.log'
-       line=read_data('relax.log')
-       if line==0:
-           state='SCF failed'
-           line=[0.000000,0.000000]
-       else:
-           if float(line[-1]) <= 0.03:
-              state='conver success'
+               if float(line[-1]) <= 0.03:
+                  state='conver success'
+               else:
+                   state='force failed'
+        if os.path.exists('{}/relax.log'.format(folder)):
+           output_name='relax.log'
+           line=read_data('{}/relax.log'.format(folder))
+           if line==0:
+               state='SCF failed'
+               line=[0.000000,0.000000]
            else:
-               state='force failed'
-    if not output_name:
-       state='log inexist'
-       line=[0,0]
-    #write('{}T.png'.format(folname), atoms)
-    #write('{}S.png'.format(folname), atoms, rotation='-90x')
-    #os.system('mv *.png /naslx/projects/pr47fo/ge39luv2/structure/picture')
-    try:
-        judge_spin=check_spin('nspin','SPIN','{}/{}/esp.log'.format(pathway,folname))
-    except:
+               if float(line[-1]) <= 0.03:
+                  state='conver success'
+               else:
+                   state='force failed'
+        if not output_name:
+           state='log inexist'
+           line=[0,0]
+        #write('{}T.png'.format(folname), atoms)
+        #write('{}S.png'.format(folname), atoms, rotation='-90x')
+        #os.system('mv *.png /naslx/projects/pr47fo/ge39luv2/structure/picture')
         try:
-            judge_spin=check_spin('nspin','SPIN','{}/{}'.format(pathway,folname))
+            judge_spin=check_spin('nspin','SPIN','{}/esp.log'.format(folder))
         except:
-            judge_spin='NoPW.inp'
-    write_data('result',folname,line,pathway,state,judge_spin,bond_calculation,angle_calculation,coordinate_calculation)
-    print(folname)
+            try:
+                judge_spin=check_spin('nspin','SPIN',folder)
+            except:
+                judge_spin='NoPW.inp'
+        write_data(output_file,folname,line,state,judge_spin,bond_calculation,angle_calculation,coordinate_calculation)
+        print(folname)
 print('This is the end of data transfer')
 
 
@@ -6,6 +6,8 @@
 
 #instruction: In order to delete the wave function file in esp.log release space
 import os,sys
+import glob
+import shutil
 
 
 # In[2]:
@@ -13,17 +15,19 @@ import os,sys
 
 def del_qe():
     pathway=os.getcwd()
-    folnames=os.listdir(pathway)
-    folnames.sort()
-    for folname in folnames:
-        os.chdir(folname)
-        if os.path.exits('esp.log'):
-            os.chdir('esp.log')
-            os.system('rm -r qe*')    ###delete qexxxxx folder 
+    for folder in sorted(os.scandir(pathway),key=lambda entry: entry.name):
+        if not folder.is_dir():
+            continue
+        esp=os.path.join(folder.path,'esp.log')
+        if os.path.exists(esp):
+            for qe in glob.glob(os.path.join(esp,'qe*')):    ###delete qexxxxx folder 
+                if os.path.isdir(qe):
+                    shutil.rmtree(qe,ignore_errors=True)
+                else:
+                    os.remove(qe)
         else:
             print('esp.log does not exist, delete calc.save')
-            os.system('rm -r calc.save')
-        continue
+            shutil.rmtree(os.path.join(folder.path,'calc.save'),ignore_errors=True)
     print('This is the end of clean space')
 
 
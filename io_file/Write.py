@@ -5,6 +5,9 @@
 
 
 import os,sys
+import re
+import mmap
+from contextlib import contextmanager
 
 
 # In[ ]:
@@ -13,58 +16,61 @@ import os,sys
 ###instruction:  get a series of variable into a list then write them to one line
 ###requirement:  pathway:  args 
 def write_data(pathway,folname='folname',*args):
+    with open(pathway,'a') as output_file: ###mode 'a' means add content at the end of last line
+        write_row(output_file,folname,*args)
+
+###instruction:  same line as write_data, but into a file handle the caller keeps open for many rows
+def write_row(output_file,folname='folname',*args):
     args=list(args)
     #print args
-    for i in range(0,len(args)):  #0 is the patheway, 1 is the folname so we start from 2
-        if isinstance(args[i],float) == 'True':
-           args[i]=round(args[i],4)  #keep 4 figure after point   0 is the pathway, 1 is the folname so we start from 2
+    for i in range(0,len(args)):
+        if isinstance(args[i],float):
+           args[i]=round(args[i],4)  #keep 4 figure after point
         args[i]=str(args[i])
-    args="  ".join(args)
-    with open(pathway,'a') as output_file: ###mode 'a' means add content at the end of last line
-        output_file.write(folname)
-        output_file.write('  ')
-        output_file.writelines(args)
-        output_file.write('\n')
+    output_file.write(folname+'  '+"  ".join(args)+'\n')
+
+@contextmanager
+def map_file(fname):
+    ###read-only memory map of fname, unmapped on exit; mmap refuses empty files, those give b''
+    with open(fname,"rb") as infile:
+        if os.fstat(infile.fileno()).st_size == 0:
+           yield b''
+           return
+        data = mmap.mmap(infile.fileno(),0,access=mmap.ACCESS_READ)
+        try:
+            yield data
+        finally:
+            data.close()
 
 def write_paragraph(fname,newname,*keywords):
-    file_data = ""
-    data = []
-    with open(fname,"r") as infile:
-	for line in infile:
-	   # for keyword in keywords: 
-		if any(map(line.startswith,keywords)):
-		    data.append(line)
-		else:
-		    break
-		
-    with open(newname,"a") as outfile:
-	for line in data:
-	     outfile.write(line)
+    ###copy the leading lines that start with one of keywords, up to the first line that does not
+    if not keywords:
+       return
+    paragraph = re.compile(b'(?:(?:' + b'|'.join(re.escape(keyword.encode()) for keyword in keywords) + b')[^\n]*(?:\n|$))*')
+    with map_file(fname) as data:
+        end = paragraph.match(data).end()
+        with open(newname,"ab") as outfile:
+             outfile.write(data[:end])
+
 def write_to_ending(fname,newname,startword):
-    file_data = ""
-    data = []
-    startwriting = False
-    with open(fname,"r") as infile:
-         for line in infile:
-	     if startwriting == True:
-                data.append(line)
-             if line.startswith(startword):
-		startwriting=True
-                data.append(line)
-    with open(newname,"a") as outfile:
-	for line in data:
-	     outfile.write(line)
+    ###copy everything from the first line starting with startword to the end of the file
+    startword = startword.encode()
+    with map_file(fname) as data:
+         if data[:len(startword)] == startword:
+            start = 0
+         else:
+            start = data.find(b'\n'+startword)
+            if start == -1:
+               return
+            start += 1
+         with open(newname,"ab") as outfile:
+             outfile.write(data[start:])
 
 def write_final_line(fname,newname,finalline):
-    file_data=""
-    data = []
-    with open(fname,"r") as infile:
-             lines=infile.readlines()
-             for line in lines[:-2]:
-	         data.append(line)
-    with open(newname,"w") as outfile:
-         for line in data:
-	     outfile.write(line)
-         outfile.write(finalline)
-	
-		 
+    ###copy fname without its last two lines, then add finalline
+    with map_file(fname) as data:
+         last = data.rfind(b'\n',0,len(data)-1)+1
+         end = data.rfind(b'\n',0,last-1)+1 if last > 0 else 0
+         with open(newname,"wb") as outfile:
+             outfile.write(data[:end])
+             outfile.write(finalline.encode())
@@ -4,6 +4,10 @@ import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib import rcParams
 import os
+import sys
+import inspect
+import shutil
+import hashlib
 import matplotlib.ticker as ticker
 from scipy.constants import golden_ratio
 from scipy import constants
@@ -35,13 +39,21 @@ def enB(x,E1s):   #bonding orbital energy at x
 def enAB(x,E1s): #antibonding orbital energy at x
     return E1s + 1./x + (-J(x)+K(x))/(1-S(x))
 
+def enB_AB(x,E1s): #bonding and antibonding energies at x, S, J and K share one exp(-x)
+    e = np.exp(-x)
+    s = (1+x+(1./3)*x**2)*e
+    j = 1./x - e*e*(1+1./x)
+    k = (1+x)*e
+    return E1s + 1./x - (j+k)/(1+s), E1s + 1./x + (-j+k)/(1-s)
+
 
 
 class plot_of_energies():
 
     """ simple class to plot a figure """
-    def __init__(self):
+    def __init__(self,use_latex=False):
         self.path = os.getcwd()
+        self.use_latex = use_latex   #latex + dvipng per label is slow: only for publication figures
         self.colors = [tumcolors['tumorange'],tumcolors['diag_pantone300_85'],tumcolors['diag_red_85'],tumcolors['diag_purple_70'],tumcolors['diag_red_85'],tumcolors['pantone300'],tumcolors['tumred'],tumcolors['tumlightblue'],tumcolors['acc_red'],tumcolors['tumorange'],tumcolors['lightgray'],\
                        tumcolors['acc_lightblue'],tumcolors['pantone283'],tumcolors['tumgreen'],tumcolors['tumorange'],\
                                               tumcolors['tumivory'],tumcolors['pantone542'],tumcolors['darkgray'],tumcolors['pantone301'],\
@@ -51,28 +63,35 @@ class plot_of_energies():
 
 
 
-    def _set_plotting_env(self,width=None,height=None,lrbt=None):
+    def _rc_dict(self,width=None,height=None,lrbt=None):
+        #rc overrides for plot(): applied in an rc_context, so the global rcParams stay untouched
+        rc = {}
         if (width == None and height == None):
             width = 3.37
             height = width / golden_ratio *1.5/2 +1
         if (lrbt == None):
             lrbt = [0.135,0.955,0.25,0.78]
         # set plot geometry
-        rcParams['figure.figsize'] = (width, height) # x,y
+        rc['figure.figsize'] = (width, height) # x,y
         #rcParams['font.weight'] = 'medium' #'bold'
         #rcParams['font.style'] = 'normal' #'italic'
-        rcParams['font.size'] = 12.0
+        rc['font.size'] = 12.0
         #rcParams['mathtext.fontset'] = 'cm'#'stix', 'cm'
-        rcParams['figure.subplot.left'] = lrbt[0]   # the left side of the subplots of the figure
-        rcParams['figure.subplot.right'] = lrbt[1]  # the right side of the subplots of the figure
-        rcParams['figure.subplot.bottom'] = lrbt[2] # the bottom of the subplots of the figure
-        rcParams['figure.subplot.top'] = lrbt[3]    # the top of the subplots of the figure
-        rcParams['figure.subplot.wspace'] = 0.2
-        rcParams['figure.subplot.hspace'] = 0.2
+        rc['figure.subplot.left'] = lrbt[0]   # the left side of the subplots of the figure
+        rc['figure.subplot.right'] = lrbt[1]  # the right side of the subplots of the figure
+        rc['figure.subplot.bottom'] = lrbt[2] # the bottom of the subplots of the figure
+        rc['figure.subplot.top'] = lrbt[3]    # the top of the subplots of the figure
+        rc['figure.subplot.wspace'] = 0.2
+        rc['figure.subplot.hspace'] = 0.2
+        rc['font.family'] = 'serif'
+        if not self.use_latex:
+            #mathtext renders the labels in-process, cm matches the latex look
+            rc['text.usetex'] = False
+            rc['mathtext.fontset'] = 'cm'
+            return rc
         #the good latex math fonts:
-        rcParams['text.usetex'] = True
+        rc['text.usetex'] = True
         latex_preamble = []
-        rcParams['font.family'] = 'serif'
         packages = [ r'\usepackage[group-decimal-digits = false]{siunitx}',
                      r'\usepackage{amsmath}',
                      r'\usepackage{braket}',  ]
@@ -85,58 +104,90 @@ class plot_of_energies():
         latex_preamble.extend(siunitx_settings)
         colors = [r'\usepackage[names]{xcolor}']
         latex_preamble.extend(colors)
-        rcParams['text.latex.preamble'] = latex_preamble
+        rc['text.latex.preamble'] = latex_preamble
+        return rc
+
+    def plot(self,fn,width=None,height=None,lrbt=None):
+        #run fn(plt) with this template's settings, e.g. fn builds, writes or shows a figure
+        with plt.rc_context(self._rc_dict(width=width,height=height,lrbt=lrbt)):
+            return fn(plt)
 
 
     def execute(self):
-        self._set_plotting_env(width=None,height=None,lrbt=[0.2,0.95,0.25,0.85]) #for eps
-        
-        fig1 = plt.figure()
-        ax = fig1.add_subplot(111)
-        
+        lrbt=[0.2,0.95,0.25,0.85]
         ymin=-0.2;ymax=1;
         xmin=0.000001;xmax=5;
-        ax.set_ylim(ymin,ymax)
-        ax.set_xlim(xmin,xmax)
-        ax.tick_params(
-                axis='x',         # changes apply to the x-axis
-                which='both',     # both major and minor ticks are affected
-                bottom='on',      # ticks along the bottom edge are off
-                top='on',         # ticks along the top edge are off
-                labelbottom='on') # labels along the bottom edge are off
+        E1s=-13.6/HtoeV   #Hartree, approx
+        width=None;height=None;
+        labels={'B':r'$\epsilon_{+}$(B)',
+                'AB':r'$\epsilon_{-}$(AB)',
+                'x':r'R [a$_{0}$]',
+                'y':r'$\epsilon$-E$_{1s}$ [Hartree]',
+                'title':r'LCAO Binding Energy of H$_{2}^{+}$'}
+        figname='template'
+        #rendering every label again is wasted work: reuse the written files while the inputs are unchanged;
+        #the module source is part of the key, so any edit to colours, sizes or the drawing code renders anew
+        source=inspect.getsource(sys.modules[__name__])
+        key=hashlib.sha1(repr((E1s,xmin,xmax,ymin,ymax,lrbt,width,height,sorted(labels.items()),self.use_latex)).encode()
+                         +source.encode('utf-8')).hexdigest()
+        cache=os.path.join(self.path,'.cache')
+        cached={ext:os.path.join(cache,'energies_{}.{}'.format(key,ext)) for ext in ('eps','pdf','png')}
+        if all(os.path.isfile(cachefile) for cachefile in cached.values()):
+            if not os.path.isdir('output'):
+                os.makedirs('output')
+            for ext,cachefile in cached.items():
+                shutil.copyfile(cachefile,os.path.join('output','{}.{}'.format(figname,ext)))
+            return
+
+        #rc settings only hold inside the context: nothing leaks into the caller's later figures
+        with plt.rc_context(self._rc_dict(width=width,height=height,lrbt=lrbt)): #for eps
+        
+            fig1 = plt.figure()
+            ax = fig1.add_subplot(111)
+        
+            ax.set_ylim(ymin,ymax)
+            ax.set_xlim(xmin,xmax)
+            ax.tick_params(
+                    axis='x',         # changes apply to the x-axis
+                    which='both',     # both major and minor ticks are affected
+                    bottom='on',      # ticks along the bottom edge are off
+                    top='on',         # ticks along the top edge are off
+                    labelbottom='on') # labels along the bottom edge are off
         
-        ax.xaxis.set_major_locator(ticker.MultipleLocator(1)); 
-        ax.xaxis.set_minor_locator(ticker.MultipleLocator(0.5)); 
-        ax.yaxis.set_major_locator(ticker.MultipleLocator(0.2));
-        ax.yaxis.set_minor_locator(ticker.MultipleLocator(0.1));
+            ax.xaxis.set_major_locator(ticker.MultipleLocator(1)); 
+            ax.xaxis.set_minor_locator(ticker.MultipleLocator(0.5)); 
+            ax.yaxis.set_major_locator(ticker.MultipleLocator(0.2));
+            ax.yaxis.set_minor_locator(ticker.MultipleLocator(0.1));
   
-        E1s=-13.6/HtoeV   #Hartree, approx
-        x = np.linspace(xmin,xmax,1000)
-        energyB = enB(x,E1s)
-        energyAB = enAB(x,E1s)
-        #ax.annotate(r'$\epsilon_{+}$', xy=(0.8,0.2))#,size=2,color="k")
-        #ax.annotate(r'$\epsilon_{-}$', xy=(0.3,1.3))#,size=12,color="k")
-
-        ax.plot(x,energyB-E1s,color=[0.0, 0.396078431372549, 0ls.7411764705882353],lw=2,label=r'$\epsilon_{+}$(B)')
-        #ax.plot(x,energyAB-E1s,color=[0.7686274509803922, 0.027450980392156862, 0.10588235294117647],lw=2,label=r'$\epsilon_{-}$(AB)') 
-        ax.plot(x,energyAB-E1s,color=tumcolors['tumorange'],lw=2,label=r'$\epsilon_{-}$(AB)') 
-        ax.axhline(0,lw=0.5,color='k',ls='--')
-
-        emin=np.amin(energyB-E1s)
-        xmin=x[np.where(energyB-E1s==emin)]
+            x = np.linspace(xmin,xmax,1000)
+            energyB, energyAB = enB_AB(x,E1s)
+            #ax.annotate(r'$\epsilon_{+}$', xy=(0.8,0.2))#,size=2,color="k")
+            #ax.annotate(r'$\epsilon_{-}$', xy=(0.3,1.3))#,size=12,color="k")
+
+            ax.plot(x,energyB-E1s,color=[0.0, 0.396078431372549, 0.7411764705882353],lw=2,label=labels['B'])
+            #ax.plot(x,energyAB-E1s,color=[0.7686274509803922, 0.027450980392156862, 0.10588235294117647],lw=2,label=r'$\epsilon_{-}$(AB)') 
+            ax.plot(x,energyAB-E1s,color=tumcolors['tumorange'],lw=2,label=labels['AB'])
+            ax.axhline(0,lw=0.5,color='k',ls='--')
+
+            imin=np.argmin(energyB)
+            emin=energyB[imin]-E1s
+            xmin=x[imin]
         
 
-        ax.annotate(r'R$_{min}$='+'{}'.format(round(xmin,2))+r'a$_0$,'+r' E$_{min}$'+'={}'.format(round(emin,2))+'Ha', xy=(2,0.4),size=6,color='k')#,size=12,color="k")
-        ax.annotate(r'', xy=(xmin,emin),xytext=(xmin,0.4),size=4,arrowprops=dict(arrowstyle="->",connectionstyle="arc3",color="k"))
+            ax.annotate(r'R$_{min}$='+'{}'.format(round(xmin,2))+r'a$_0$,'+r' E$_{min}$'+'={}'.format(round(emin,2))+'Ha', xy=(2,0.4),size=6,color='k')#,size=12,color="k")
+            ax.annotate(r'', xy=(xmin,emin),xytext=(xmin,0.4),size=4,arrowprops=dict(arrowstyle="->",connectionstyle="arc3",color="k"))
         
-        ax.set_xlabel(r'R [a$_{0}$]')#,size=12)
-        ax.set_ylabel(r'$\epsilon$-E$_{1s}$ [Hartree]')#,size=12)
-        plt.legend(fontsize=8) 
-        fig1.suptitle(r'LCAO Binding Energy of H$_{2}^{+}$')#,fontsize=8)
+            ax.set_xlabel(labels['x'])#,size=12)
+            ax.set_ylabel(labels['y'])#,size=12)
+            plt.legend(fontsize=8) 
+            fig1.suptitle(labels['title'])#,fontsize=8)
         
-        #plt.savefig('energies.png',dpi=300,transparent=False)
-        figname='template'
-        matplotlibhelpers.write(figname,transparent=True,write_info = False,write_png=True,write_pdf=True,write_eps=True)
+            #plt.savefig('energies.png',dpi=300,transparent=False)
+            matplotlibhelpers.write(figname,transparent=True,write_info = False,write_png=True,write_pdf=True,write_eps=True)
+        if not os.path.isdir(cache):
+            os.makedirs(cache)
+        for ext,cachefile in cached.items():
+            shutil.copyfile(os.path.join('output','{}.{}'.format(figname,ext)),cachefile)
 
 
 
@@ -6,6 +6,8 @@ import scipy.linalg as SP
 import matplotlib
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 import math
 from scipy import constants
 import sys
@@ -19,7 +21,14 @@ import os
 #import matplotlib.ticker as ticker
 from matplotlib.ticker import MultipleLocator, FormatStrFormatter
 import subprocess
+import multiprocessing
+import tempfile
 from scipy.constants import golden_ratio, inch
+plt.ioff()
+try:
+    from numba import njit
+except ImportError:
+    njit = None
 from gamma_test2 import gamma_test2
 #from get_couplings import get_couplings
 
@@ -28,6 +37,152 @@ HtoeV=constants.physical_constants["Hartree energy in eV"][0]
 autime=constants.physical_constants["atomic unit of time"][0]*1E15 #in fs\        ??????
 
 
+def load_txt(path):
+    #np.loadtxt once, then reuse a binary .npy copy next to the text file until the text file changes
+    npy = path+'.npy'
+    if not os.path.exists(npy) or os.path.getmtime(npy) < os.path.getmtime(path):
+        #written under a temporary name and renamed over the cache: a process that mmaps the .npy
+        #meanwhile sees the old or the new file, never a truncated one
+        fd, tmp = tempfile.mkstemp(suffix='.npy', dir=os.path.dirname(npy) or '.')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, np.loadtxt(path))
+            os.rename(tmp, npy)
+        except BaseException:
+            os.remove(tmp)
+            raise
+    return np.load(npy, mmap_mode='r')
+
+if njit is not None:
+    @njit
+    def max_in_range(x,y,xmin,xmax):
+        #largest y whose x lies in [xmin,xmax], in one compiled pass without a mask array; -inf if there is none
+        ymax=-np.inf
+        for i in range(x.shape[0]):
+            if x[i] >= xmin and x[i] <= xmax and y[i] > ymax:
+                ymax=y[i]
+        return ymax
+else:
+    def max_in_range(x,y,xmin,xmax):
+        #without numba a python loop is far slower than a masked max; -inf if there is none
+        y_inrange = y[(x >= xmin) & (x <= xmax)]
+        if y_inrange.size:
+            return y_inrange.max()
+        return -np.inf
+
+
+def window(x,xmin,xmax):
+    #rows with x in [xmin,xmax]: a slice (view, no mask array) for sorted energy grids, a boolean mask otherwise
+    if np.all(x[1:] >= x[:-1]):
+        return slice(np.searchsorted(x,xmin,side='left'),np.searchsorted(x,xmax,side='right'))
+    return (x >= xmin) & (x <= xmax)
+
+def eps_from_pdf(figure,fileloc):
+    #pdftops converts the written pdf much faster than matplotlib's PS backend renders the figure again
+    try:
+        subprocess.check_call(['pdftops','-eps',fileloc+'.pdf',fileloc+'.eps'])
+    except OSError:   #no pdftops (poppler-utils) on this machine
+        figure.savefig(fileloc+'.eps',transparent=True)
+
+def donor_files(mtag,donor_index_local):
+    #RAW text inputs of one donor: gamma up/dn and couplings up/dn
+    return ('method{}/gamma_test_donor={}_{}{}RAW.txt'.format(mtag,donor_index_local,'up',mtag),
+            'method{}/gamma_test_donor={}_{}{}RAW.txt'.format(mtag,donor_index_local,'dn',mtag),
+            'method{}/habup_donorindex{}{}RAW.txt'.format(mtag,donor_index_local,mtag),
+            'method{}/habdn_donorindex{}{}RAW.txt'.format(mtag,donor_index_local,mtag))
+
+def donor_keys(donor_index_local):
+    #bundle keys of one donor, in the order of donor_files
+    return ['{}_{}'.format(kind,donor_index_local) for kind in ('gammaup','gammadn','habup','habdn')]
+
+def bundle_is_current(bundle,paths,keys):
+    #the bundle exists, is newer than every RAW file and holds every key
+    if not os.path.exists(bundle) or any(os.path.getmtime(path) > os.path.getmtime(bundle) for path in paths):
+        return False
+    data = np.load(bundle)
+    try:
+        return all(key in data.files for key in keys)
+    finally:
+        data.close()
+
+def write_bundle(mtag,donor_indices):
+    #all donors of one method in a single binary method{mtag}/bundle.npz, keyed gammaup_<donor>, gammadn_<donor>, habup_<donor>, habdn_<donor>
+    #a one-time conversion: rebuilt only when it is missing a donor or older than a RAW file
+    bundle = 'method{}/bundle.npz'.format(mtag)
+    paths = [path for donor_index_local in donor_indices for path in donor_files(mtag,donor_index_local)]
+    keys = [key for donor_index_local in donor_indices for key in donor_keys(donor_index_local)]
+    if bundle_is_current(bundle,paths,keys):
+        return
+    #straight from the text files: no per-file .npy copies next to the bundle
+    np.savez(bundle, **dict((key,np.loadtxt(path)) for key,path in zip(keys,paths)))
+
+def load_donor(mtag,donor_index_local):
+    #gammaup, gammadn, habup, habdn from the bundle while it is newer than the RAW files, else from the per-file cache
+    bundle = 'method{}/bundle.npz'.format(mtag)
+    paths = donor_files(mtag,donor_index_local)
+    if os.path.exists(bundle) and all(os.path.getmtime(path) <= os.path.getmtime(bundle) for path in paths):
+        data = np.load(bundle)
+        try:
+            keys = donor_keys(donor_index_local)
+            if all(key in data.files for key in keys):
+                return tuple(data[key] for key in keys)
+        finally:
+            data.close()
+    return tuple(load_txt(path) for path in paths)
+
+
+#looked up once per process instead of once per xy_plot instance
+plot_colors = (tumcolors['tumorange'],tumcolors['diag_pantone300_85'],tumcolors['diag_red_85'],tumcolors['diag_purple_70'],tumcolors['diag_red_85'],tumcolors['pantone300'],tumcolors['tumred'],tumcolors['tumlightblue'],tumcolors['acc_red'],tumcolors['tumorange'],tumcolors['lightgray'],\
+               tumcolors['acc_lightblue'],tumcolors['pantone283'],tumcolors['tumgreen'],tumcolors['tumorange'],\
+               tumcolors['tumivory'],tumcolors['pantone542'],tumcolors['darkgray'],tumcolors['pantone301'],\
+               tumcolors['acc_yellow'])
+
+#Fermi level per (aims.out, mtime), shared by every donor plotted in this process
+mu_cache = {}
+
+def read_mu(path='../aims.out'):
+    #last 'Chemical potential (Fermi level):' value of the aims output, in eV
+    key = (os.path.abspath(path), os.path.getmtime(path))
+    if key not in mu_cache:
+        mu = None
+        with open(path) as infile:
+            for line in infile:
+                if 'Chemical potential (Fermi level):' in line:
+                    mu = float(line.split()[5])
+        mu_cache[key] = mu
+    return mu_cache[key]
+
+#geometry of the last _set_plotting_env call; the latex setup only has to run once per process
+plotting_env = {'geometry':None, 'latex':False}
+
+#(text, size) of every latex string plot_gc_inner draws; mathtext can't do \ket or \text, so usetex stays
+latex_labels = ((r'E - $\epsilon_F$ [eV]',8),
+                (r'$\Gamma$[fs$^{-1}$]',8),
+                (r'$\mathopen|\text{H}_{\text{da}}\mathclose|$ [meV]',8),
+                (r'$\Gamma$(E$_{\text{d}}$)',9),
+                (r'$\mathbf{\ket{\uparrow}}$',14),
+                (r'$\mathbf{\ket{\downarrow}}$',14))
+
+
+def warm_tex_cache():
+    #render all labels once on a throwaway figure: latex/dvipng then run here and the per-figure draws hit the tex cache
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    for i,(text,size) in enumerate(latex_labels):
+        fig.text(0.1,0.1*(i+1),text,size=size)
+    fig.canvas.draw()
+
+
+#(major, minor) tick spacing: energy axis per window size, gamma axis below/above 10 fs^-1
+tick_spacing = {'SMALL':(1,0.5), 'LARGE':(2,1), 'gamma':(2,1), 'GAMMA':(20,5)}
+
+
+def set_tick_spacing(axes,spacing):
+    #a locator binds to the axis it is set on (set_axis), so it can't be shared: every axis gets its own pair
+    major,minor = spacing
+    for axis in axes:
+        axis.set_major_locator(MultipleLocator(major))
+        axis.set_minor_locator(MultipleLocator(minor))
 
 
 class xy_plot():
@@ -35,10 +190,7 @@ class xy_plot():
     """ simple class to plot a figure """
     def __init__(self):
         self.path = os.getcwd()
-        self.colors = [tumcolors['tumorange'],tumcolors['diag_pantone300_85'],tumcolors['diag_red_85'],tumcolors['diag_purple_70'],tumcolors['diag_red_85'],tumcolors['pantone300'],tumcolors['tumred'],tumcolors['tumlightblue'],tumcolors['acc_red'],tumcolors['tumorange'],tumcolors['lightgray'],\
-                       tumcolors['acc_lightblue'],tumcolors['pantone283'],tumcolors['tumgreen'],tumcolors['tumorange'],\
-                       tumcolors['tumivory'],tumcolors['pantone542'],tumcolors['darkgray'],tumcolors['pantone301'],\
-                       tumcolors['acc_yellow']]
+        self.colors = plot_colors
 
 
     def _set_plotting_env(self,width=None,height=None,lrbt=None):
@@ -48,6 +200,10 @@ class xy_plot():
             height = width / golden_ratio *1.5/2  + 0.2
         if (lrbt == None):
             lrbt = [0.135,0.955,0.25,0.78]
+        geometry = (width,height,tuple(lrbt))
+        if plotting_env['geometry'] == geometry:
+            return
+        plotting_env['geometry'] = geometry
         #print width,height
         # set plot geometry
         rcParams['figure.figsize'] = (width, height) # x,y
@@ -66,34 +222,69 @@ class xy_plot():
         rcParams['figure.subplot.hspace'] = 0.2
 
         rcParams['axes.linewidth'] = 0.5 #rcParams['axes.linewidth'] *scale
-        matplotlibhelpers.set_latex(rcParams,font = "lmodern") #paper         #these override the rcParams fonts above...
+        if not plotting_env['latex']:
+            matplotlibhelpers.set_latex(rcParams,font = "lmodern") #paper         #these override the rcParams fonts above...
+            warm_tex_cache()
+            plotting_env['latex'] = True
        # matplotlibhelpers.set_latex(rcParams,font = "helvetica") #poster
 
 
 
 
 
-    def plot_gc_inner(self,mu,sysindex,Ecenter_up,Ecenter_dn, mtag,donor_index_local,use_resonance,resonance):
+    def plot_gc_inner(self,mu,sysindex,Ecenter_up,Ecenter_dn, mtag,donor_index_local,use_resonance,resonance,formats=('png','pdf','eps')):
         self._set_plotting_env(width=None,height=None,lrbt=[0.15,0.87,0.2,0.92]) #for eps
     #    dosup = np.loadtxt('dos_lorentzian_up{}.txt'.format(mtag))   #these are shifted to Efermi and are in eV.
     #    dosdn = np.loadtxt('dos_lorentzian_dn{}.txt'.format(mtag))   #these are independent of the chosen donor state.
         
         #gammaup = np.loadtxt('gamma_test_up_m2.txt')
         #gammadn = np.loadtxt('gamma_test_dn_m2.txt')
-        gammaup = np.loadtxt('method{}/gamma_test_donor={}_{}{}RAW.txt'.format(mtag,donor_index_local,'up',mtag))   #depends on the donor.  RAW unshifted eV energies.
-        gammadn = np.loadtxt('method{}/gamma_test_donor={}_{}{}RAW.txt'.format(mtag,donor_index_local,'dn',mtag))
-        
-        habup = np.loadtxt('method{}/habup_donorindex{}{}RAW.txt'.format(mtag,donor_index_local,mtag))    #RAW eV
-        habdn = np.loadtxt('method{}/habdn_donorindex{}{}RAW.txt'.format(mtag,donor_index_local,mtag))       
+        gammaup,gammadn,habup,habdn = load_donor(mtag,donor_index_local)   #depends on the donor.  RAW unshifted eV energies.
+        #single precision is plenty for plot coordinates and halves what goes through the artists
+        gammaup,gammadn,habup,habdn = [data.astype(np.float32) for data in (gammaup,gammadn,habup,habdn)]
 
 
 
+        sigma=2  #the second value of sigma used is 0.25 eV
+        #shifted energies, couplings and axis limits only depend on the data: computed once for all 8 figures
+        habup_x = habup[:,1]-mu
+        habdn_x = habdn[:,1]-mu
+        gammaup_x = gammaup[:,0]-mu
+        gammadn_x = gammadn[:,0]-mu
+        gammaup_y = gammaup[:,sigma]
+        gammadn_y = gammadn[:,sigma]
         #xmax=5
         #xmin=-5
+        windows = {'SMALL':(-6,6), 'LARGE':(-10,10)}
+        width=0.05
+        #only bars that can reach into the window become artists
+        bars = dict((size,(window(habup_x,xmin-width,xmax+width), window(habdn_x,xmin-width,xmax+width)))
+                    for size,(xmin,xmax) in windows.items())
+        #only |H_da| in meV is plotted, the |H_da|**2 variant is gone
+        cup = np.abs(habup[:,3])*1000.
+        cdn = np.abs(habdn[:,3])*1000.
+        limits = {}
+        for size,(xmin,xmax) in windows.items():
+            ycmaxup = max_in_range(habup_x,cup,xmin,xmax)
+            ycmaxdn = max_in_range(habdn_x,cdn,xmin,xmax)
+            if ycmaxup == -np.inf and ycmaxdn == -np.inf:
+                continue   #no couplings in this window, nothing worth a figure
+            ycmax = max(ycmaxup,ycmaxdn)*1.3
+            ygmaxup = max_in_range(gammaup_x,gammaup_y,xmin,xmax)
+            ygmaxdn = max_in_range(gammadn_x,gammadn_y,xmin,xmax)
+            if ygmaxup > -np.inf and ygmaxdn > -np.inf:
+                ygmax = max(ygmaxup,ygmaxdn)*1.1
+            else: ygmax=1
+            limits[size] = (ycmax,ygmax)
+
+        #figures are only written to file: one Agg canvas outside the pyplot state machine, cleared for every variant
+        fig1 = Figure()
+        FigureCanvasAgg(fig1)
         for plotgamma in [True,False]:
             for size in ['SMALL','LARGE']:
-                if size == 'SMALL': xmax=6;xmin=-6
-                elif size == 'LARGE': xmax=10;xmin=-10
+                if size not in limits: continue
+                xmin,xmax = windows[size]
+                bup,bdn = bars[size]
         #        updos_inrange = [ dosup[i,1] for i in range(len(dosup[:,0])) if (dosup[i,0] <= xmax) and (dosup[i,0] >= xmin) ]
         #        dndos_inrange = [ dosdn[i,1] for i in range(len(dosdn[:,0])) if (dosdn[i,0] <= xmax) and (dosdn[i,0] >= xmin) ]
         #        ymaxup=np.max(updos_inrange)#np.array(DOS[0][1])[:,1])
@@ -101,309 +292,209 @@ class xy_plot():
         #        ymax = np.max((ymaxup,ymaxdn))*1.2
                 #find range for couplings**1
  
-                for exponent in [1]:  #2]:
-                    cup_inrange = [ abs(habup[i,exponent+2])*1000. for i in range(len(habup[:,0])) if (habup[i,1] <= xmax+mu) and (habup[i,1] >= xmin+mu) ]
-                    cdn_inrange = [ abs(habdn[i,exponent+2])*1000. for i in range(len(habdn[:,0])) if (habdn[i,1] <= xmax+mu) and (habdn[i,1] >= xmin+mu) ]
-                    #print('{}'.format(len(cup_inrange)))
-                    #print('{}'.format(len(cdn_inrange)))
-                    #print('{}'.format(np.max(cup_inrange)))
-                    #print('{}'.format(np.max(cdn_inrange)))
-                    ycmaxup=np.max(cup_inrange)#np.array(DOS[0][1])[:,1])
-                    ycmaxdn=np.max(cdn_inrange)#np.array(DOS[1][1])[:,1])
-                    ycmax = np.max((ycmaxup,ycmaxdn))*1.3
-                    #TEST TEST
-                    #ycmax = 1000  #TEST TEST
-                    ycmin=0.0   #unless log
- 
-                    sigma=2  #the second value of sigma used is 0.25 eV
-                    gup_inrange = [ gammaup[i,sigma] for i in range(len(gammaup[:,0])) if (gammaup[i,0] <= xmax+mu) and (gammaup[i,0] >= xmin+mu) ]
-                    gdn_inrange = [ gammadn[i,sigma] for i in range(len(gammadn[:,0])) if (gammadn[i,0] <= xmax+mu) and (gammadn[i,0] >= xmin+mu) ]
-                    #print('{}'.format(gup_inrange))
-                    #print('{}'.format(gdn_inrange))
-                    #print('{}'.format(len(gup_inrange)))
-                    #print('{}'.format(len(gdn_inrange)))
-                    #print('{}'.format(np.max(gup_inrange)))
-                    #print('{}'.format(np.max(gdn_inrange)))
-                    if gup_inrange != [] and gdn_inrange != []:
-                        ygmaxup=np.max(gup_inrange)#np.array(DOS[0][1])[:,1])
-                        ygmaxdn=np.max(gdn_inrange)#np.array(DOS[1][1])[:,1])
-                        ygmax = np.max((ygmaxup,ygmaxdn))*1.1
-                    else: ygmax=1
-                    ygmin=0.0
- 
- 
+                ycmax,ygmax = limits[size]
+                xticks = tick_spacing[size]
+                gticks = tick_spacing['gamma'] if ygmax <= 10 else tick_spacing['GAMMA']
+                #TEST TEST
+                #ycmax = 1000  #TEST TEST
+                ycmin=0.0   #unless log
+                ygmin=0.0
  
- 
- 
-                    for uselog in [False,True]:
-                        fig1 = plt.figure()
-                       
-                        ax = fig1.add_subplot(211)
-                        
-                     #   print('dos ymax for the domain is {}'.format(ymax))
-                  #      ax.set_xlim(xmin,xmax)  #-1*HtoeV,1.5*HtoeV)
-                  #      ax.set_ylim(0,ymax)  #-1*HtoeV,1.5*HtoeV)
-                                     
-                        #ycmax = np.max((ycmaxup,ycmaxdn))*1.5
-                        #if exponent==1: ycmin=10e-8                   #; ycmax = np.max((ycmaxup,ycmaxdn))*1.5
-                        #elif exponent==2:  ycmin=(10e-8*HtoeV)**2     #;ycmax=0.1*HtoeV**2;
-                        #ycmin=0.
-                        #ycmax=0.1*HtoeV**2
-                        #ycmax = np.max((ycmaxup,ycmaxdn))*1.6
-                        if uselog: 
-                            ycmax = ycmax*100 #np.max((ycmaxup,ycmaxdn))*1000; 
-                            if exponent==1: ycmin=10e-4
-                            elif exponent==2: ycmin=(10e-4*HtoeV)**2    
-                        
-                        #print('max coupling**2 in range is up {} dn {} '.format(ycmaxup, ycmaxdn))
-                        print('ycmin, ycmax is {} {} '.format(ycmin,ycmax)) 
+                for uselog in [False,True]:
+                    fig1.clf()
+                   
+                    ax = fig1.add_subplot(211)
                     
-                 #       ax.plot( dosup[:,0], dosup[:,1],linewidth=1.0,label='up',color=tumcolors['mediumgray'],zorder=0)
-                        
-                        #ax.annotate(r'$\text{Ar4s}$', xy=(0.68,0.7),textcoords='axes fraction',size=9,color="k")
-                   #     ax.annotate('d{}'.format(donor_index_local), xy=(Ecenter_up,0.7),textcoords=('data','axes fraction'),size=9,color="k")
+                 #   print('dos ymax for the domain is {}'.format(ymax))
+              #      ax.set_xlim(xmin,xmax)  #-1*HtoeV,1.5*HtoeV)
+              #      ax.set_ylim(0,ymax)  #-1*HtoeV,1.5*HtoeV)
+                                 
+                    #ycmax = np.max((ycmaxup,ycmaxdn))*1.5
+                    #if exponent==1: ycmin=10e-8                   #; ycmax = np.max((ycmaxup,ycmaxdn))*1.5
+                    #elif exponent==2:  ycmin=(10e-8*HtoeV)**2     #;ycmax=0.1*HtoeV**2;
+                    #ycmin=0.
+                    #ycmax=0.1*HtoeV**2
+                    #ycmax = np.max((ycmaxup,ycmaxdn))*1.6
+                    if uselog: 
+                        ycmax = ycmax*100 #np.max((ycmaxup,ycmaxdn))*1000; 
+                        ycmin=10e-4
+                    
+                    #print('max coupling**2 in range is up {} dn {} '.format(ycmaxup, ycmaxdn))
+                    print('ycmin, ycmax is {} {} '.format(ycmin,ycmax)) 
+                
+             #       ax.plot( dosup[:,0], dosup[:,1],linewidth=1.0,label='up',color=tumcolors['mediumgray'],zorder=0)
+                    
+                    #ax.annotate(r'$\text{Ar4s}$', xy=(0.68,0.7),textcoords='axes fraction',size=9,color="k")
+               #     ax.annotate('d{}'.format(donor_index_local), xy=(Ecenter_up,0.7),textcoords=('data','axes fraction'),size=9,color="k")
 ##                       ax.annotate(r'', xy=(0.95,0.85),xycoords='axes fraction',xytext=(0.95,0.45),textcoords='axes fraction',size=9,color="w",arrowprops=dict(arrowstyle="->",connectionstyle="arc3",color="k"),zorder=1)
-                        ax.axvline(x=Ecenter_up, ymin=0., ymax=10.,linewidth=1,linestyle='-',color=tumcolors['tumred'],zorder=0)          
-                        if use_resonance:
-                            ax.axvline(x=resonance, ymin=0., ymax=100.,linewidth=1,linestyle='--',color=tumcolors['tumred'],zorder=0)          
-                            ax.annotate('Ar4s', xy=(resonance,0.7),textcoords=('data','axes fraction'),size=9,color="k")
-                        ax.axvline(x=0, ymin=0., ymax=1000.,linewidth=0.5,linestyle='--',color=tumcolors['black'],zorder=0)
+                    ax.axvline(x=Ecenter_up, ymin=0., ymax=10.,linewidth=1,linestyle='-',color=tumcolors['tumred'],zorder=0)          
+                    if use_resonance:
+                        ax.axvline(x=resonance, ymin=0., ymax=100.,linewidth=1,linestyle='--',color=tumcolors['tumred'],zorder=0)          
+                        ax.annotate('Ar4s', xy=(resonance,0.7),textcoords=('data','axes fraction'),size=9,color="k")
+                    ax.axvline(x=0, ymin=0., ymax=1000.,linewidth=0.5,linestyle='--',color=tumcolors['black'],zorder=0)
+                    
+                    if True: #coupling stuff
+                        #ax1 = ax.twinx()
+                        #couplings Had in meV units.
+                        if uselog: ax.bar( habup_x[bup],cup[bup],width,color=tumcolors['tumblue'],edgecolor='none',log=1,zorder=1) #,label=r'|H$_{ad}$|$^{2}$' )
+                        else:  ax.bar( habup_x[bup],cup[bup],width,color=tumcolors['tumblue'],edgecolor='none',zorder=1) #,label=r'|H$_{ad}$|$^{2}$' )
                         
-                	if True: #coupling stuff
-                            #ax1 = ax.twinx()
-                            width=0.05
-                            #couplings Had in meV units.
-                            if uselog: ax.bar( habup[:,1]-mu,abs(habup[:,exponent+2])*(1000**exponent),width,color=tumcolors['tumblue'],edgecolor='none',log=1,zorder=1) #,label=r'|H$_{ad}$|$^{2}$' )
-                            else:  ax.bar( habup[:,1]-mu,abs(habup[:,exponent+2])*(1000**exponent),width,color=tumcolors['tumblue'],edgecolor='none',zorder=1) #,label=r'|H$_{ad}$|$^{2}$' )
-                            
-                            ax.set_xlim(xmin,xmax)  #-1*HtoeV,1.5*HtoeV)
-                            ax.set_ylim(ycmin,ycmax)  #-1*HtoeV,1.5*HtoeV)
-                            
-                        if True:  #gamma stuff
-                            ax11 = ax.twinx()
-                            if plotgamma: ax11.plot( gammaup[:,0]-mu, gammaup[:,sigma],linewidth=1.0,label='up',linestyle='-',color=tumcolors['black'],zorder=0)
-                    	    ax11.set_xlim(xmin,xmax)  #-1*HtoeV,1.5*HtoeV)
-                            ax11.set_ylim(ygmin,ygmax)  #-1*HtoeV,1.5*HtoeV)
-               
-               
-               
+                        ax.set_xlim(xmin,xmax)  #-1*HtoeV,1.5*HtoeV)
+                        ax.set_ylim(ycmin,ycmax)  #-1*HtoeV,1.5*HtoeV)
                         
-                        ax2 = fig1.add_subplot(212,sharex=ax)
-                        ax2.axvline(x=0, ymin=0., ymax=1000.,linewidth=0.5,linestyle='--',color=tumcolors['black'],zorder=0)
-                        ax2.axvline(x=Ecenter_dn, ymin=0., ymax=10.,linewidth=1,linestyle='-',color=tumcolors['tumred'],zorder=0)          
-                        if use_resonance: ax2.axvline(x=resonance, ymin=0., ymax=10.,linewidth=1,linestyle='--',color=tumcolors['tumred'],zorder=0)          
+                    if True:  #gamma stuff
+                        ax11 = ax.twinx()
+                        if plotgamma: ax11.plot( gammaup_x, gammaup_y,linewidth=1.0,label='up',linestyle='-',color=tumcolors['black'],zorder=0)
+                        ax11.set_xlim(xmin,xmax)  #-1*HtoeV,1.5*HtoeV)
+                        ax11.set_ylim(ygmin,ygmax)  #-1*HtoeV,1.5*HtoeV)
+           
+           
+           
+                    
+                    ax2 = fig1.add_subplot(212,sharex=ax)
+                    ax2.axvline(x=0, ymin=0., ymax=1000.,linewidth=0.5,linestyle='--',color=tumcolors['black'],zorder=0)
+                    ax2.axvline(x=Ecenter_dn, ymin=0., ymax=10.,linewidth=1,linestyle='-',color=tumcolors['tumred'],zorder=0)          
+                    if use_resonance: ax2.axvline(x=resonance, ymin=0., ymax=10.,linewidth=1,linestyle='--',color=tumcolors['tumred'],zorder=0)          
 ##                       ax2.annotate(r'', xy=(0.95,0.15),xycoords='axes fraction',xytext=(0.95,0.55),textcoords='axes fraction',size=9,color="w",arrowprops=dict(arrowstyle="->",connectionstyle="arc3",color="k"), zorder=1)
-                        #if shiftdos and annotate:  ax2.axvline(x=Ecenter, ymin=0., ymax=10.,linewidth=2,linestyle='--',color=tumcolors['tumred'])          
-                   #     ax2.plot( dosdn[:,0],dosdn[:,1],linewidth=1.0,label='dn',color=tumcolors['mediumgray'],zorder=0) 
-                    #    ax2.set_xlim(xmin,xmax)  #-1*HtoeV,1.5*HtoeV)
-                    #    ax2.set_ylim(0,ymax)  #-1*HtoeV,1.5*HtoeV)
-                        
-                        ax2.set_xlabel(r'E - $\epsilon_F$ [eV]')
-                        
-                        if True: #coupling things
+                    #if shiftdos and annotate:  ax2.axvline(x=Ecenter, ymin=0., ymax=10.,linewidth=2,linestyle='--',color=tumcolors['tumred'])          
+               #     ax2.plot( dosdn[:,0],dosdn[:,1],linewidth=1.0,label='dn',color=tumcolors['mediumgray'],zorder=0) 
+                #    ax2.set_xlim(xmin,xmax)  #-1*HtoeV,1.5*HtoeV)
+                #    ax2.set_ylim(0,ymax)  #-1*HtoeV,1.5*HtoeV)
+                    
+                    ax2.set_xlabel(r'E - $\epsilon_F$ [eV]')
                     
-                            #ax3 = ax2.twinx()
+                    if True: #coupling things
+                
+                        #ax3 = ax2.twinx()
 ##                          #coupling Hab in meV or meV**2
-                            if uselog: ax2.bar( habdn[:,1]-mu, abs(habdn[:,exponent+2])*(1000),width,edgecolor='none',color=tumcolors['tumblue'],log=1,zorder=1) #,label=r'|H$_{ad}$|$^{2}$' )
-                            else: ax2.bar( habdn[:,1]-mu, abs(habdn[:,exponent+2])*(1000**exponent) ,width,edgecolor='none',color=tumcolors['tumblue'],zorder=1)
+                        if uselog: ax2.bar( habdn_x[bdn], cdn[bdn],width,edgecolor='none',color=tumcolors['tumblue'],log=1,zorder=1) #,label=r'|H$_{ad}$|$^{2}$' )
+                        else: ax2.bar( habdn_x[bdn], cdn[bdn] ,width,edgecolor='none',color=tumcolors['tumblue'],zorder=1)
+                
+                        ax2.set_xlim(xmin,xmax)  #-1*HtoeV,1.5*HtoeV)
+                        ax2.set_ylim(ycmin,ycmax)  #-1*HtoeV,1.5*HtoeV)
                     
-                            ax2.set_xlim(xmin,xmax)  #-1*HtoeV,1.5*HtoeV)
-                            ax2.set_ylim(ycmin,ycmax)  #-1*HtoeV,1.5*HtoeV)
-                        
-                        if True:  #gamma stuff
-                            ax22 = ax2.twinx()
-                	        #sigma=2
-                            if plotgamma: ax22.plot( gammadn[:,0]-mu, gammadn[:,sigma],linewidth=1.0,label='up',linestyle='-',color=tumcolors['black'],zorder=0)   #energies are shifted.
-                    	    ax22.set_xlim(xmin,xmax)  #-1*HtoeV,1.5*HtoeV)
-                            ax22.set_ylim(ygmin,ygmax)  #-1*HtoeV,1.5*HtoeV)
-                        
-                        
-                        if size=='LARGE':
-                            ax.xaxis.set_major_locator(ticker.MultipleLocator(2))
-                            ax.xaxis.set_minor_locator(ticker.MultipleLocator(1))
-                            ax2.xaxis.set_major_locator(ticker.MultipleLocator(2))
-                            ax2.xaxis.set_minor_locator(ticker.MultipleLocator(1))
-                            #ax.xaxis.set_major_locator(ticker.MultipleLocator(1))
-                            #ax.xaxis.set_minor_locator(ticker.MultipleLocator(0.5))
-                            #ax2.xaxis.set_major_locator(ticker.MultipleLocator(1))
-                            #ax2.xaxis.set_minor_locator(ticker.MultipleLocator(0.5))
-                        
-                        elif size=='SMALL':
-                            ax.xaxis.set_major_locator(ticker.MultipleLocator(1))
-                            ax.xaxis.set_minor_locator(ticker.MultipleLocator(0.5))
-                            ax2.xaxis.set_major_locator(ticker.MultipleLocator(1))
-                            ax2.xaxis.set_minor_locator(ticker.MultipleLocator(0.5))
+                    if True:  #gamma stuff
+                        ax22 = ax2.twinx()
+                            #sigma=2
+                        if plotgamma: ax22.plot( gammadn_x, gammadn_y,linewidth=1.0,label='up',linestyle='-',color=tumcolors['black'],zorder=0)   #energies are shifted.
+                        ax22.set_xlim(xmin,xmax)  #-1*HtoeV,1.5*HtoeV)
+                        ax22.set_ylim(ygmin,ygmax)  #-1*HtoeV,1.5*HtoeV)
+                    
+                    
+                    set_tick_spacing((ax.xaxis,ax2.xaxis),xticks)
  
  
-                      #  if  ycmax <= 10:
-                      #      ax.yaxis.set_major_locator(ticker.MultipleLocator(2))
-                      #      ax.yaxis.set_minor_locator(ticker.MultipleLocator(1))
-                      #      ax2.yaxis.set_major_locator(ticker.MultipleLocator(2))
-                      #      ax2.yaxis.set_minor_locator(ticker.MultipleLocator(1))
-                      #  else:
-                      #      ax.yaxis.set_major_locator(ticker.MultipleLocator(20))
-                      #      ax.yaxis.set_minor_locator(ticker.MultipleLocator(10))
-                      #      ax2.yaxis.set_major_locator(ticker.MultipleLocator(20))
-                      #      ax2.yaxis.set_minor_locator(ticker.MultipleLocator(10))
-                        
-                        if  ygmax <= 10:
-                            ax11.yaxis.set_major_locator(ticker.MultipleLocator(2))
-                            ax11.yaxis.set_minor_locator(ticker.MultipleLocator(1))
-                            ax22.yaxis.set_major_locator(ticker.MultipleLocator(2))
-                            ax22.yaxis.set_minor_locator(ticker.MultipleLocator(1))
-                        else:  #let this be automatic
-                            ax11.yaxis.set_major_locator(ticker.MultipleLocator(20))
-                            ax11.yaxis.set_minor_locator(ticker.MultipleLocator(5))
-                            ax22.yaxis.set_major_locator(ticker.MultipleLocator(20))
-                            ax22.yaxis.set_minor_locator(ticker.MultipleLocator(5))
-                         
-                        
-                        ax.tick_params(
-                                    axis='x',          # changes apply to the x-axis
-                                    which='both',      # both major and minor ticks are affected
-                                    bottom='off',      # ticks along the bottom edge are off
-                                    top='on',         # ticks along the top edge are off
-                                    labelbottom='off') # labels along the bottom edge are off
-                        ax.tick_params(
-                                    axis='y',          # changes apply to the x-axis
-                                    which='both',      # both major and minor ticks are affected
-                                    #bottom='off',      # ticks along the bottom edge are off
-                                    left='on',
-                                    right='off',
-                                    #top='on',         # ticks along the top edge are off
-                                    labelleft='on') # labels along the bottom edge are off
-                        
-                        #ax1.ticklabel_format(style='sci',axis='y')
-                        ax11.tick_params(
-                                    axis='x',          # changes apply to the x-axis
-                                    which='both',      # both major and minor ticks are affected
-                                    bottom='off',      # ticks along the bottom edge are off
-                                    right='off',
-                                    top='off',         # ticks along the top edge are off
-                                    labelbottom='off') # labels along the bottom edge are off
-                        ax11.tick_params(
-                                    axis='y',          # changes apply to the x-axis
-                                    which='both',      # both major and minor ticks are affected
-                                    right='on',      # ticks along the bottom edge are off
-                                    left='off',         # ticks along the top edge are off
-                                    labelright='on') # labels along the bottom edge are off
-                        
-                        ax2.tick_params(
-                                    axis='y',          # changes apply to the x-axis
-                                    which='both',      # both major and minor ticks are affected
-                                    left='on',      # ticks along the bottom edge are off
-                                    right='off',         # ticks along the top edge are off
-                                    labelleft='on',
-                                    labelright='off') # labels along the bottom edge are off
-                        ax2.tick_params(
-                                    axis='x',          # changes apply to the x-axis
-                                    which='both',      # both major and minor ticks are affected
-                                    bottom='on',      # ticks along the bottom edge are off
-                                    top='off',         # ticks along the top edge are off
-                                    labelbottom='on',
-                                    labeltop='off') # labels along the bottom edge are off
-                        
-                        ax22.tick_params(
-                                    axis='x',          # changes apply to the x-axis
-                                    which='both',      # both major and minor ticks are affected
-                                    bottom='off',      # ticks along the bottom edge are off
-                                    top='off',         # ticks along the top edge are off
-                                    labelbottom='off',
-                                    labeltop='off') # labels along the bottom edge are off
-                        ax22.tick_params(
-                                    axis='y',          # changes apply to the x-axis
-                                    which='both',      # both major and minor ticks are affected
-                                    bottom='on',      # ticks along the bottom edge are off
-                                    top='off',         # ticks along the top edge are off
-                                    left='off',
-                                    right='on',
-                                    labelright='on',
-                                    labelleft='off') # labels along the bottom edge are off
-                       
-                        #gamma axes
+                  #  if  ycmax <= 10:
+                  #      ax.yaxis.set_major_locator(ticker.MultipleLocator(2))
+                  #      ax.yaxis.set_minor_locator(ticker.MultipleLocator(1))
+                  #      ax2.yaxis.set_major_locator(ticker.MultipleLocator(2))
+                  #      ax2.yaxis.set_minor_locator(ticker.MultipleLocator(1))
+                  #  else:
+                  #      ax.yaxis.set_major_locator(ticker.MultipleLocator(20))
+                  #      ax.yaxis.set_minor_locator(ticker.MultipleLocator(10))
+                  #      ax2.yaxis.set_major_locator(ticker.MultipleLocator(20))
+                  #      ax2.yaxis.set_minor_locator(ticker.MultipleLocator(10))
+                    
+                    set_tick_spacing((ax11.yaxis,ax22.yaxis),gticks)
+                     
+                    
+                    #one call per axes: bottom/top/labelbottom go to the x ticks, left/right/labelleft/labelright to the y ticks
+                    ax.tick_params(axis='both', which='both',
+                                bottom=False, top=True, labelbottom=False,
+                                left=True, right=False, labelleft=True)
+                    ax11.tick_params(axis='both', which='both',
+                                bottom=False, top=False, labelbottom=False,
+                                left=False, right=True, labelright=True)
+                    ax2.tick_params(axis='both', which='both',
+                                bottom=True, top=False, labelbottom=True, labeltop=False,
+                                left=True, right=False, labelleft=True, labelright=False)
+                    ax22.tick_params(axis='both', which='both',
+                                bottom=False, top=False, labelbottom=False, labeltop=False,
+                                left=False, right=True, labelright=True, labelleft=False)
+                   
+                    #gamma axes
  
-                    #    ax11.spines['left'].set_position(('outward', 30))      
-                        # no x-ticks                 
-                    #    ax11.xaxis.set_ticks([])
-                        
-                    #    ax33.spines['left'].set_position(('outward', 30))      
-                        # no x-ticks                 
-                    #    ax33.xaxis.set_ticks([])
+                #    ax11.spines['left'].set_position(('outward', 30))      
+                    # no x-ticks                 
+                #    ax11.xaxis.set_ticks([])
+                    
+                #    ax33.spines['left'].set_position(('outward', 30))      
+                    # no x-ticks                 
+                #    ax33.xaxis.set_ticks([])
  
  
-                 #       ax11.tick_params(
-                 #                   axis='y',          # changes apply to the x-axis
-                 #                   which='both',      # both major and minor ticks are affected
-                 #                   bottom='on',      # ticks along the bottom edge are off
-                 #                   left='on',
-                 #                   right='off',
-                 #                   top='on',         # ticks along the top edge are off
-                 #                   labelleft='on',
-                 #                   labelright='off') # labels along the bottom edge are off
-                 #       ax11.tick_params(
-                 #                   axis='x',          # changes apply to the x-axis
-                 #                   which='both',      # both major and minor ticks are affected
-                 #                   bottom='on',      # ticks along the bottom edge are off
-                 #                   #left='on',
-                 #                   #right='off',
-                 #                   top='on',         # ticks along the top edge are off
-                 #                   labelbottom='off',
-                 #                   labeltop='off') # labels along the bottom edge are off
-                 #       ax33.tick_params(
-                 #                   axis='y',          # changes apply to the x-axis
-                 #                   which='both',      # both major and minor ticks are affected
-                 #                   bottom='on',      # ticks along the bottom edge are off
-                 #                   left='on',
-                 #                   right='off',
-                 #                   top='off',         # ticks along the top edge are off
-                 #                   labelright='off',
-                 #                   labelleft='on') # labels along the bottom edge are off
-                 #       ax33.tick_params(
-                 #                   axis='x',          # changes apply to the x-axis
-                 #                   which='both',      # both major and minor ticks are affected
-                 #                   bottom='on',      # ticks along the bottom edge are off
-                 #                   #left='on',
-                 #                   #right='off',
-                 #                   top='on',         # ticks along the top edge are off
-                 #                   labelbottom='off',
-                 #                   labeltop='off') # labels along the bottom edge are off
-                      
+             #       ax11.tick_params(
+             #                   axis='y',          # changes apply to the x-axis
+             #                   which='both',      # both major and minor ticks are affected
+             #                   bottom='on',      # ticks along the bottom edge are off
+             #                   left='on',
+             #                   right='off',
+             #                   top='on',         # ticks along the top edge are off
+             #                   labelleft='on',
+             #                   labelright='off') # labels along the bottom edge are off
+             #       ax11.tick_params(
+             #                   axis='x',          # changes apply to the x-axis
+             #                   which='both',      # both major and minor ticks are affected
+             #                   bottom='on',      # ticks along the bottom edge are off
+             #                   #left='on',
+             #                   #right='off',
+             #                   top='on',         # ticks along the top edge are off
+             #                   labelbottom='off',
+             #                   labeltop='off') # labels along the bottom edge are off
+             #       ax33.tick_params(
+             #                   axis='y',          # changes apply to the x-axis
+             #                   which='both',      # both major and minor ticks are affected
+             #                   bottom='on',      # ticks along the bottom edge are off
+             #                   left='on',
+             #                   right='off',
+             #                   top='off',         # ticks along the top edge are off
+             #                   labelright='off',
+             #                   labelleft='on') # labels along the bottom edge are off
+             #       ax33.tick_params(
+             #                   axis='x',          # changes apply to the x-axis
+             #                   which='both',      # both major and minor ticks are affected
+             #                   bottom='on',      # ticks along the bottom edge are off
+             #                   #left='on',
+             #                   #right='off',
+             #                   top='on',         # ticks along the top edge are off
+             #                   labelbottom='off',
+             #                   labeltop='off') # labels along the bottom edge are off
+                  
  
-                        #ax.annotate('Ar4s', xy=(resonance,ymax*0.7),textcoords='data',size=9,color="k")
+                    #ax.annotate('Ar4s', xy=(resonance,ymax*0.7),textcoords='data',size=9,color="k")
 ##                       ax.annotate(  r'$\mathbf{\ket{\uparrow}}$', xy=(0.8,0.5),size=15,textcoords='axes fraction',color="black")
 ##                       ax2.annotate(  r'$\mathbf{\ket{\downarrow}}$', xy=(0.8,0.5),size=15,textcoords='axes fraction',color="black")
-                        
-                      #  fig1.text(0.94,0.75, r'$\mathbf{\ket{\uparrow}}$',va='center',rotation=None,size=14)    #side
-                      #  fig1.text(0.94,0.3, r'$\mathbf{\ket{\downarrow}}$',va='center',rotation=None,size=14) 
-                        ax.annotate(r'$\mathbf{\ket{\uparrow}}$',xy=(1.09,0.55), textcoords='axes fraction', va='center',rotation=None,size=14,annotation_clip=False)     #inside
-                        ax2.annotate(r'$\mathbf{\ket{\downarrow}}$',xy=(1.09,0.45), textcoords='axes fraction', va='center',rotation=None,size=14,annotation_clip=False) 
+                    
+                  #  fig1.text(0.94,0.75, r'$\mathbf{\ket{\uparrow}}$',va='center',rotation=None,size=14)    #side
+                  #  fig1.text(0.94,0.3, r'$\mathbf{\ket{\downarrow}}$',va='center',rotation=None,size=14) 
+                    ax.annotate(r'$\mathbf{\ket{\uparrow}}$',xy=(1.09,0.55), textcoords='axes fraction', va='center',rotation=None,size=14,annotation_clip=False)     #inside
+                    ax2.annotate(r'$\mathbf{\ket{\downarrow}}$',xy=(1.09,0.45), textcoords='axes fraction', va='center',rotation=None,size=14,annotation_clip=False) 
  
  
  
-                        if plotgamma: ax11.annotate(r'$\Gamma$(E$_{\text{d}}$)', xy=(0.75,5),textcoords=('data','data'),size=9,color="k")
-                        
-                        
-                        fig1.text(0.93,0.55,'$\Gamma$[fs$^{-1}$]',va='center',rotation='vertical') 
-                        #fig1.text(0.13,0.55,'DOS [states/eV/cell]',va='center',rotation='vertical') 
-                        if exponent==1: fig1.text(0.01,0.55,r'$\mathopen|\text{H}_{\text{da}}\mathclose|$ [meV]',va='center',rotation='vertical') 
-                        elif exponent==2: fig1.text(0.05,0.55,r'$\mathopen|\text{H}_{\text{da}}\mathclose|^2$ [eV$^2$]',va='center',rotation='vertical') 
-                     #   plt.suptitle('Acceptor DOS',fontsize=12)#+namestring,fontsize=10)
-                        
-                        ax2.invert_yaxis()
-                        ax22.invert_yaxis()
-                      #  ax33.invert_yaxis()
-                       
-                        syslabels=[r'$\textbf{Fe}$',r'$\textbf{Co}$',r'$\textbf{Ni}$','']
-                        ax2.annotate(syslabels[sysindex], xy=(0.05,0.1),textcoords='axes fraction',size=12,color="k")
+                    if plotgamma: ax11.annotate(r'$\Gamma$(E$_{\text{d}}$)', xy=(0.75,5),textcoords=('data','data'),size=9,color="k")
+                    
+                    
+                    fig1.text(0.93,0.55,'$\Gamma$[fs$^{-1}$]',va='center',rotation='vertical') 
+                    #fig1.text(0.13,0.55,'DOS [states/eV/cell]',va='center',rotation='vertical') 
+                    fig1.text(0.01,0.55,r'$\mathopen|\text{H}_{\text{da}}\mathclose|$ [meV]',va='center',rotation='vertical') 
+                 #   plt.suptitle('Acceptor DOS',fontsize=12)#+namestring,fontsize=10)
+                    
+                    ax2.invert_yaxis()
+                    ax22.invert_yaxis()
+                  #  ax33.invert_yaxis()
+                   
+                    syslabels=[r'$\textbf{Fe}$',r'$\textbf{Co}$',r'$\textbf{Ni}$','']
+                    ax2.annotate(syslabels[sysindex], xy=(0.05,0.1),textcoords='axes fraction',size=12,color="k")
  
  
  
-                        plt.subplots_adjust(hspace=0.0)
-                        figname = 'method{}/gc{}_donorindex{}{}_{}'.format(mtag,exponent,donor_index_local,mtag,size)
-                        if uselog==True: figname=figname+'log'
-                        if plotgamma: figname = figname+'_g'
-                        matplotlibhelpers.write(figname,transparent=True,write_info = False,write_png=True,write_pdf=True,write_eps=True)
-                        plt.close(fig1)
+                    fig1.subplots_adjust(hspace=0.0)
+                    figname = 'method{}/gc1_donorindex{}{}_{}'.format(mtag,donor_index_local,mtag,size)
+                    if uselog==True: figname=figname+'log'
+                    if plotgamma: figname = figname+'_g'
+                    matplotlibhelpers.write(figname,figure=fig1,transparent=True,write_info = False,write_png='png' in formats,write_pdf='pdf' in formats or 'eps' in formats,write_eps=False)
+                    if 'eps' in formats: eps_from_pdf(fig1,os.path.join('output',figname))
             
             
         
@@ -414,7 +505,8 @@ class xy_plot():
  
 
 
-def plot_gc(mtag,sysindex,donor_index_local):
+def plot_gc(mtag,sysindex,donor_index_local,formats=('png','pdf','eps')):
+    #formats=('png',) skips the vector output while iterating on a plot
 
 
 
@@ -456,16 +548,15 @@ def plot_gc(mtag,sysindex,donor_index_local):
  
          
  
-        mu=str(subprocess.check_output("grep 'Chemical potential (Fermi level):' ../aims.out  |  awk '{ print  $6}'  | tail -n 1", shell=True))
-        mu=float(mu[:-3])
+        mu=read_mu('../aims.out')
         print('mu is {}'.format(mu))
         
         #if len(sys.argv) > 2: donor_index_local=int(sys.argv[2])           #Ar4s has index 9 (level 10)
         #else: donor_index_local=9
         print('using donor index {}'.format(donor_index_local))
         
-        wd_sorted_up = np.loadtxt('method{}/wd_sorted_up{}RAW'.format(mtag,mtag)+'.txt')[:,1]   #eV, unshifted.
-        wd_sorted_dn = np.loadtxt('method{}/wd_sorted_dn{}RAW'.format(mtag,mtag)+'.txt')[:,1]
+        wd_sorted_up = load_txt('method{}/wd_sorted_up{}RAW'.format(mtag,mtag)+'.txt')[:,1]   #eV, unshifted.
+        wd_sorted_dn = load_txt('method{}/wd_sorted_dn{}RAW'.format(mtag,mtag)+'.txt')[:,1]
  
         Ecenter_up = wd_sorted_up[donor_index_local] - mu     #for method 3 there are multiple options... 
         Ecenter_dn = wd_sorted_dn[donor_index_local] - mu 
@@ -481,10 +572,28 @@ def plot_gc(mtag,sysindex,donor_index_local):
  
  
         a = xy_plot()
-        a.plot_gc_inner(mu,sysindex,Ecenter_up, Ecenter_dn,mtag,donor_index_local,use_resonance, resonance)
+        a.plot_gc_inner(mu,sysindex,Ecenter_up, Ecenter_dn,mtag,donor_index_local,use_resonance, resonance, formats)
         print('finnished {}'.format(mtag))
     return None;
 
 
+def plot_gc_donor(args):
+    #single-donor entry point that can be pickled to the worker processes
+    return plot_gc(*args)
+
+def plot_gc_donors(mtag,sysindex,donor_indices,formats=('png','pdf','eps')):
+    #donors share no state and Agg is process safe: render their figures in parallel
+    write_bundle(mtag,donor_indices)
+    #every worker reads the orbital energies: convert them once here instead of racing on the cache
+    for spin in ('up','dn'):
+        load_txt('method{}/wd_sorted_{}{}RAW'.format(mtag,spin,mtag)+'.txt')
+    pool = multiprocessing.Pool()
+    try:
+        pool.map(plot_gc_donor, [(mtag,sysindex,donor_index_local,formats) for donor_index_local in donor_indices])
+    finally:
+        pool.close()
+        pool.join()
+
+
 if __name__ == "__main__":
     plot_gc(mtag,sysindex,donor_index_local)
@@ -9,8 +9,9 @@ import os,sys
 class plot_of_energies():
     
     """ simple class to plot a figure """
-    def __init__(self):
+    def __init__(self,use_latex=False):
         self.path = os.getcwd()
+        self.use_latex = use_latex   #latex + dvipng per label is slow: only for publication figures
         self.colors = [tumcolors['tumorange'],tumcolors['diag_pantone300_85'],tumcolors['diag_red_85'],
                        tumcolors['diag_purple_70'],tumcolors['diag_red_85'],tumcolors['pantone300'],
                        tumcolors['tumred'],tumcolors['tumlightblue'],tumcolors['acc_red'],tumcolors['tumorange'],
@@ -19,28 +20,35 @@ class plot_of_energies():
                        tumcolors['darkgray'],tumcolors['pantone301'],tumcolors['acc_yellow']]
 
 
-    def _set_plotting_env(self,width=None,height=None,lrbt=None):
+    def _rc_dict(self,width=None,height=None,lrbt=None):
+        #rc overrides for plot(): applied in an rc_context, so the global rcParams stay untouched
+        rc = {}
         if (width == None and height == None):
             width = 3.37
             height = width / golden_ratio *1.5/2 +1
         if (lrbt == None):
             lrbt = [0.135,0.955,0.25,0.78]
         # set plot geometry
-        rcParams['figure.figsize'] = (width, height) # x,y
+        rc['figure.figsize'] = (width, height) # x,y
         #rcParams['font.weight'] = 'medium' #'bold'
         #rcParams['font.style'] = 'normal' #'italic'
-        rcParams['font.size'] = 12.0
+        rc['font.size'] = 12.0
         #rcParams['mathtext.fontset'] = 'cm'#'stix', 'cm'
-        rcParams['figure.subplot.left'] = lrbt[0]   # the left side of the subplots of the figure
-        rcParams['figure.subplot.right'] = lrbt[1]  # the right side of the subplots of the figure
-        rcParams['figure.subplot.bottom'] = lrbt[2] # the bottom of the subplots of the figure
-        rcParams['figure.subplot.top'] = lrbt[3]    # the top of the subplots of the figure
-        rcParams['figure.subplot.wspace'] = 0.2
-        rcParams['figure.subplot.hspace'] = 0.2
+        rc['figure.subplot.left'] = lrbt[0]   # the left side of the subplots of the figure
+        rc['figure.subplot.right'] = lrbt[1]  # the right side of the subplots of the figure
+        rc['figure.subplot.bottom'] = lrbt[2] # the bottom of the subplots of the figure
+        rc['figure.subplot.top'] = lrbt[3]    # the top of the subplots of the figure
+        rc['figure.subplot.wspace'] = 0.2
+        rc['figure.subplot.hspace'] = 0.2
+        rc['font.family'] = 'serif'
+        if not self.use_latex:
+            #mathtext renders the labels in-process, cm matches the latex look
+            rc['text.usetex'] = False
+            rc['mathtext.fontset'] = 'cm'
+            return rc
         #the good latex math fonts:
-        rcParams['text.usetex'] = True
+        rc['text.usetex'] = True
         latex_preamble = []
-        rcParams['font.family'] = 'serif'
         packages = [ r'\usepackage[group-decimal-digits = false]{siunitx}',
                      r'\usepackage{amsmath}',
                      r'\usepackage{braket}',  ]
@@ -53,13 +61,21 @@ class plot_of_energies():
         latex_preamble.extend(siunitx_settings)
         colors = [r'\usepackage[names]{xcolor}']
         latex_preamble.extend(colors)
-        rcParams['text.latex.preamble'] = latex_preamble
+        rc['text.latex.preamble'] = latex_preamble
+        return rc
+
+    def plot(self,fn,width=None,height=None,lrbt=None):
+        #run fn(plt) with this template's settings, e.g. fn builds, writes or shows a figure
+        with plt.rc_context(self._rc_dict(width=width,height=height,lrbt=lrbt)):
+            return fn(plt)
+
+def sine(plt):
+    fig1 = plt.figure()
+    ax = fig1.add_subplot(111)
+    x=np.random.rand(100)
+    y=np.sin(x)
+    ax.plot(x,y)
+    plt.show()
 
 plt_template=plot_of_energies()
-plt_template._set_plotting_env(width=None,height=None,lrbt=[0.2,0.95,0.25,0.85])
-fig1 = plt.figure()
-ax = fig1.add_subplot(111)
-x=np.random.rand(100)
-y=np.sin(x)
-ax.plot(x,y)
-plt.show()
\ No newline at end of file
+plt_template.plot(sine,width=None,height=None,lrbt=[0.2,0.95,0.25,0.85])
\ No newline at end of file
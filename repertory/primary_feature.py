@@ -1,25 +1,48 @@
-import pickle,cPickle
+import pickle
 import numpy as np
-from scipy.integrate import simps
+from scipy.integrate import simpson
 import os,sys
+import shutil
+import subprocess
+import tempfile
 import matplotlib.pyplot as plt
 from ase.io import read,write
 from ase import Atoms,Atom
-from scipy.special import sph_harm
+try:
+    from scipy.special import sph_harm_y
+except ImportError:   #scipy < 1.15
+    from scipy.special import sph_harm
+    def sph_harm_y(n,m,theta,phi):
+        return sph_harm(m,n,phi,theta)
 import warnings
 #root 
 from parameter import PM
 from io_file import File_oprate
 
+#(energy, Ef) of every esp.log/log parsed so far, keyed by (path, mtime) so a rerun calculation is read again
+log_cache = {}
+
+def read_log(pathway,folname):
+    """
+    Output:
+    - energy, Ef: last total energy and last Fermi energy of the quantum-espresso log (one pass, read once per file)
+    """
+    logname='{}/{}/esp.log/log'.format(pathway,folname)
+    key=(logname,os.path.getmtime(logname))
+    if key not in log_cache:
+        energy=None
+        Ef=None
+        with open(logname,'r') as infile:
+            for line in infile:
+                if line.startswith('!    total energy'):
+                    energy=line.split()[-2]
+                elif 'Fermi energy' in line:
+                    Ef=line[29:35]
+        log_cache[key]=(energy,Ef)
+    return log_cache[key]
+
 def Get_energy(pathway,folname):
-    energy=0
-    energy_list=[]
-    with open('{}/{}/esp.log/log'.format(pathway,folname),'r') as infile:
-        lines=infile.readlines()
-        for line in lines:
-            if line.startswith('!    total energy'):
-                energy_list.append(line.split()[-2])
-    energy=float(energy_list[-1])
+    energy=float(read_log(pathway,folname)[0])
     return energy
 
 
@@ -38,15 +61,33 @@ def Formation_energy(pathway,folname,rutile_type):
                         2* E_bulk_oxide - 2*E_O2)/2*PM.Ry_to_eV
     return round(formation_energy,4) 
 
+def Formation_energy_batch(pathway,folnames,rutile_type):
+    """
+    Input:
+    - folnames: doped structures of one rutile_type
+    Output:
+    - formation energies in eV, same order as folnames (each pure reference log is read once for the whole batch)
+    """
+    name = {'Ruo2':'Ru', 'Iro2':'Ir'}[rutile_type]
+    met_site = [File_oprate.split_name(folname) for folname in folnames]
+    E_doped = np.array([Get_energy(pathway,folname) for folname in folnames])
+    E_pure = np.array([Get_energy(pathway,name+site) for met,site in met_site])
+    E_bulk_metal = np.array([PM.E_bulk_metal[met] for met,site in met_site])
+    formation_energy = (E_doped - E_pure - 2*E_bulk_metal +
+                        2*PM.E_bulk_oxide[rutile_type] - 2*PM.E_O2)/2*PM.Ry_to_eV
+    return np.round(formation_energy,4)
+
 #1-5
 class Geometry(object):
 
-    def __init__(self,site):
+    def __init__(self,site,pathway='.'):
         self.site=site
+        #folder with opt.traj; passed explicitly so parallel workers don't depend on the current directory
+        self.pathway=pathway
 
     def Variable(self):
         #read trajectory and extend supercell
-        atoms=read('opt.traj')
+        atoms=read('{}/opt.traj'.format(self.pathway))
         copy_coefficent = (1,1,1)
         if self.site[:3] == '110' or self.site[:3] == '111':
             copy_coefficent = (2,2,1)
@@ -56,9 +97,8 @@ class Geometry(object):
         self.atoms=atoms
 
     def Nearest_metal(self):
-        distance_list=[]
-        for i in PM.nearest_metal_dic[self.site][1:]:
-            distance_list.append(self.atoms.get_distance(PM.nearest_metal_dic[self.site][0],i))
+        #all distances from the site in one call; no mic, the supercell is already extended in Variable
+        distance_list=self.atoms.get_distances(PM.nearest_metal_dic[self.site][0],list(PM.nearest_metal_dic[self.site][1:]))
         distance_list.sort()
         nearest_1 = distance_list[0]
         nearest_2 = distance_list[1]
@@ -71,56 +111,31 @@ class Geometry(object):
             distance_list = ['inf']
             return distance_list
         else:
-            for i in PM.site_1foldO_dic[self.site][1:]:
-                distance_list.append(self.atoms.get_distance(PM.site_1foldO_dic[self.site][0],i))
-            distance_list.sort()
-            return round(distance_list[0],4)
+            distance_list=self.atoms.get_distances(PM.site_1foldO_dic[self.site][0],list(PM.site_1foldO_dic[self.site][1:]))
+            return round(distance_list.min(),4)
 
     def Relative_distance(self):
-        distance_list=[]
-        for i in PM.relative_dis_dic[self.site][1:]:
-            distance_list.append(self.atoms.get_distance(PM.relative_dis_dic[self.site][0],i))
-        distance_list.sort()
-        return round(distance_list[0],4)
+        distance_list=self.atoms.get_distances(PM.relative_dis_dic[self.site][0],list(PM.relative_dis_dic[self.site][1:]))
+        return round(distance_list.min(),4)
 
     def Spherical_hamonics(self):   #l= 1,2,3,4,5,6
-        O_coordinate=[]
-        #determine the coordinate of nearby Oxygen atom, put into a 5x3 list
-        for i in range(1,len(PM.hamonics_dic[self.site])):
-            O_coordinate.extend([self.atoms[PM.hamonics_dic[self.site][i]].position[0],
-                                 self.atoms[PM.hamonics_dic[self.site][i]].position[1],
-                                 self.atoms[PM.hamonics_dic[self.site][i]].position[2]])           
-        O_coordinate = np.reshape(O_coordinate,(5,3))
-        #get vector by Oxygen list minus active site coordinate
-        M_coordinate = [ self.atoms[PM.hamonics_dic[self.site][0]].position[0],
-                         self.atoms[PM.hamonics_dic[self.site][0]].position[1],
-                         self.atoms[PM.hamonics_dic[self.site][0]].position[2] ]
-        vec2_multi = O_coordinate - M_coordinate
+        #vectors from the active site to its 5 nearby Oxygen atoms
+        vec2_multi = (self.atoms.positions[list(PM.hamonics_dic[self.site][1:])]
+                      - self.atoms.positions[PM.hamonics_dic[self.site][0]])
         #compute phi: polar angle  and   theta: azimuth angle
-        phi_list=[]
-        theta_list=[]
-        for i in range(0,5):
-            r=np.sqrt(vec2_multi[i][0]**2 + vec2_multi[i][1]**2 + vec2_multi[i][2]**2)
-            phi=np.arccos(vec2_multi[i][2]/r)
-            theta=np.arctan2(vec2_multi[i][1],vec2_multi[i][0])
-            if theta  < 0:
-                theta=theta+2*np.pi
-            phi_list.append(phi)
-            theta_list.append(theta)
+        r=np.linalg.norm(vec2_multi,axis=1)
+        phi=np.arccos(vec2_multi[:,2]/r)
+        theta=np.mod(np.arctan2(vec2_multi[:,1],vec2_multi[:,0]),2*np.pi)
         #phi_list=[round(i*180/np.pi,2) for i in phi_list]
-        #compute spherical hamonics
-        Q_l_list=[]
-        for l in range(1,7):    #l=1-6
-            Q_lms=0
-            for m in range(-l,l+1):
-                Y_lms=0
-                for i in range(0,5):
-                    Y_lm= sph_harm(m,l,theta_list[i],phi_list[i])
-                    Y_lms += Y_lm
-                Q_lm=Y_lms/5 #length of oxygen_list
-                Q_lms=Q_lms+ abs(Q_lm)**2
-            Q_l=np.sqrt(4*np.pi/(2*l+1)*Q_lms)
-            Q_l_list.append(round(Q_l,4))
+        #compute spherical hamonics: all (l,m) pairs for l=1-6 against all oxygens in one sph_harm_y call
+        l_values=np.arange(1,7)
+        l_arr=np.repeat(l_values,2*l_values+1)
+        m_arr=np.concatenate([np.arange(-l,l+1) for l in l_values])
+        Y_lm=sph_harm_y(l_arr[:,None],m_arr[:,None],phi[None,:],theta[None,:])
+        Q_lm=Y_lm.sum(axis=1)/len(r) #length of oxygen_list
+        Q_lms=np.add.reduceat(abs(Q_lm)**2,np.cumsum(2*l_values+1)-(2*l_values+1))
+        Q_l=np.sqrt(4*np.pi/(2*l_values+1)*Q_lms)
+        Q_l_list=[round(q,4) for q in Q_l]
         return Q_l_list[0], Q_l_list[1], Q_l_list[2], Q_l_list[3], Q_l_list[4], Q_l_list[5]
 
 
@@ -133,13 +148,15 @@ def Fermi_level(pathway,folname):
     Output:
     - Ef
     """
-    with open('{}/{}/esp.log/log'.format(pathway,folname)) as infile:
-        lines=infile.readlines()
-    for line in lines:
-        if 'Fermi energy' in line:
-            Ef = float(line[29:35])
+    Ef = float(read_log(pathway,folname)[1])
     return round(Ef,4)
 
+#(grid size line, first potential line) of xsf_ionic_and_hartree_potential for each site
+xsf_rows = {'110cuscusM':(72,77), '110cuscusRu':(72,77), '110bricusRu':(72,77),
+            '111cuscusM':(39,44), '111bricusRu':(39,44),
+            '101cuscusM':(42,47), '101cuscusRu':(42,47),
+            '100cuscusM':(54,59), '100cuscusRu':(54,59)}
+
 #6
 def Work_function(site,Ef,pathway,filename='xsf_ionic_and_hartree_potential'):
     """
@@ -151,100 +168,73 @@ def Work_function(site,Ef,pathway,filename='xsf_ionic_and_hartree_potential'):
     - WF
     """
     #determine the extracted lines in xsf_ionic_and hartree_potential file
-    list110=['110cuscusM','110cuscusRu','110bricusRu']
-    list111=['111cuscusM','111bricusRu']
-    list101=['101cuscusM','101cuscusRu']
-    list100=['100cuscusM','100cuscusRu']
-    if site in list110:
-        number1=72; number2=77
-    if site in list111:
-        number1=39; number2=44
-    if site in list101:
-        number1=42; number2=47
-    if site in list100:
-        number1=54; number2=59
+    number1,number2 = xsf_rows[site]
     #determine the numbers of grid
     with open('{}/{}'.format(pathway,filename)) as infile:
         lines=infile.readlines()
-    nn = lines[number1].strip().split(' ')
-    nx,ny,nz=[int(x) for x in nn if x != '']
+    nx,ny,nz = [int(x) for x in lines[number1].split()]
     #determine step of grid and put the value of each x into list
-    dx = float(lines[2][4:15])/nx
-    x_values = []
-    for i in range(nx):
-        x_values.append(i*dx)
-    dy = float(lines[3][19:30])/ny
-    y_values = []
-    for i in range(ny):
-        y_values.append(i*dy)
-    dz = float(lines[4][33:])/nz
-    z_values = []
-    for i in range(nz):
-        z_values.append(i*dz)
-    #collect potential data
-    pot = []
-    for line in lines[number2:-2]:
-        values = line.strip().split(' ')
-        values = [float(x)*PM.Ry_to_eV for x in values if x != '']
-        pot += values
-    #average potential for work function calculation for z axis
-    av_pot = []
-    n=0
-    for i in range(0,nx*ny*nz,nx*ny):
-        av_pot.append(sum(pot[n*nx*ny:(n+1)*nx*ny])/(nx*ny))
-        n+=1
+    #cell lengths: diagonal of the 3x3 PRIMVEC block, parsed in one go instead of by fixed columns
+    lx,ly,lz = np.fromstring(' '.join(lines[2:5]), sep=' ').reshape(3,3).diagonal()
+    dx = lx/nx
+    x_values = np.arange(nx)*dx
+    dy = ly/ny
+    y_values = np.arange(ny)*dy
+    dz = lz/nz
+    z_values = np.arange(nz)*dz
+    #collect potential data: one C-level parse of the whole grid block
+    pot = np.fromstring(' '.join(lines[number2:-2]), sep=' ')
+    pot *= PM.Ry_to_eV
+    #average potential for work function calculation for z axis (x runs fastest, z slowest)
+    av_pot = pot[:nx*ny*nz].reshape(nz,ny*nx).mean(axis=1)
     #find the maximum potential far away from slab
     d1=5   # 4
     d2=33  # 23
-    z_fit_values = []
-    pot_fit_values = []
-    for z,p in zip(z_values,av_pot):
-        if (z<d1) or (z>d2):
-            z_fit_values.append(z)
-            pot_fit_values.append(p)
-    Ev = max(pot_fit_values)
+    Ev = av_pot[(z_values<d1) | (z_values>d2)].max()
     WF = Ev-Ef
     return round(WF,4)  
 
 #7-9
 def Bader_charge(met,site,rutile_type):
-    os.system('cp /p/project/lmcat/wenxu/scripts/bader/pre.cri .')
-    os.system('cp /p/project/lmcat/wenxu/scripts/bader/run.cri .')
-    os.system('cp /p/project/lmcat/wenxu/scripts/bader/run_bader.sh .')
-    os.system('cp xsf_charge_density charge_density.xsf')
     if rutile_type == 'Ruo2':
-        os.system('sed -i "s/zpsp Ru 16 O 6/zpsp Ru 16 O 6 {} {}/g" pre.cri'.format(met,PM.charge_list[met]))
+        zpsp = 'zpsp Ru 16 O 6 {} {}'.format(met,PM.charge_list[met])
     elif rutile_type == 'Iro2':
-        os.system('sed -i "s/zpsp Ru 16 O 6/zpsp Ir 9 O 6 {} {}/g" pre.cri'.format(met,PM.charge_list[met]))
+        zpsp = 'zpsp Ir 9 O 6 {} {}'.format(met,PM.charge_list[met])
     else:
         warnings.warn('PLEASE input the rutile type')  
         sys.exit()
-    os.system('bash run_bader.sh')
+    #critic2 runs in a scratch directory: its inputs and outputs go away with one rmtree
+    workdir = tempfile.mkdtemp(dir='.')
+    try:
+        for name in ('pre.cri','run.cri','run_bader.sh'):
+            shutil.copy('/p/project/lmcat/wenxu/scripts/bader/{}'.format(name),workdir)
+        shutil.copy('xsf_charge_density',os.path.join(workdir,'charge_density.xsf'))
+        with open(os.path.join(workdir,'pre.cri')) as infile:
+            pre = infile.read()
+        with open(os.path.join(workdir,'pre.cri'),'w') as outfile:
+            outfile.write(pre.replace('zpsp Ru 16 O 6',zpsp))
+        subprocess.check_call(['bash','run_bader.sh'],cwd=workdir)
+        with open(os.path.join(workdir,'output'),'r') as input_file:
+            lines=input_file.readlines()
+    finally:
+        shutil.rmtree(workdir)
     atom_index = PM.site_dict[site]
     metal_index = PM.surface_metal_dic[site]
     oxygen_index = PM.O_site_dict[site]
     aver_metal=0
     aver_oxygen=0
-    with open('output','r') as input_file:
-        lines=input_file.readlines()
-        n=2
-        for line in lines:
-            n=n+1
-            if line.startswith('* Integrated atomic properties'):
-                bader_charge=float(lines[n+1+atom_index].split()[-1])
-                for metalindex in metal_index:
-                    aver_metal=float(aver_metal)+float(lines[n+1+metalindex].split()[-1])
-                aver_metal = aver_metal/len(metal_index)
-                for oxygenindex in oxygen_index:
-                    aver_oxygen=float(aver_oxygen)+float(lines[n+1+oxygenindex].split()[-1])
-                aver_oxygen = aver_oxygen/len(oxygen_index)
-                break
-    os.system('rm run.cri')
-    os.system('rm charge_density.xsf')
-    os.system('rm run_bader.sh')
-    os.system('rm rhof.cube')
-    os.system('rm preoutput')
-    os.system('rm output')
+    n=2
+    for line in lines:
+        n=n+1
+        if line.startswith('* Integrated atomic properties'):
+            bader_charge=float(lines[n+1+atom_index].split()[-1])
+            for metalindex in metal_index:
+                aver_metal=float(aver_metal)+float(lines[n+1+metalindex].split()[-1])
+            aver_metal = aver_metal/len(metal_index)
+            for oxygenindex in oxygen_index:
+                aver_oxygen=float(aver_oxygen)+float(lines[n+1+oxygenindex].split()[-1])
+            aver_oxygen = aver_oxygen/len(oxygen_index)
+            break
     return round(bader_charge,4), round(aver_metal,4), round(aver_oxygen,4)
 
 #10-15
@@ -273,6 +263,34 @@ def Atomic_feature(met,site,rutile_type):
         bulk_radius = PM.atom_descriptor[met][5]
     return PE, IE, EA, Radius, Vad2, bulk_radius
 
+spin_metals=('Ni','Fe','Co')
+#pdos columns summed for each band: up/down columns for the spin polarised dopants, eg and t2g are m-resolved 'd' columns
+band_channels={'spin':  {'s':(0,1),'p':(0,1),'d':(0,1),'eg':(2,3,10,11),'t2g':(4,5,6,7,8,9)},
+               'nospin':{'s':(0,),'p':(0,),'d':(0,),'eg':(1,5),'t2g':(2,3,4)}}
+
+def dos_cache(pathway):
+    """
+    Input:
+    - pathway: folder with dos.pickle
+    Output:
+    - cache: dos.pickle.npy folder holding energies.npy, total.npy and pdos_<atom>_<state>.npy,
+      written once and again only when dos.pickle is newer
+    """
+    source='{}/dos.pickle'.format(pathway)
+    cache=source+'.npy'
+    stamp=os.path.join(cache,'energies.npy')
+    if not os.path.exists(stamp) or os.path.getmtime(stamp) < os.path.getmtime(source):
+        with open(source,"rb") as input_file:
+            dos_energies, dos_total, pdos = pickle.load(input_file, encoding='latin1')   #dos.pickle files written by python 2
+        if not os.path.isdir(cache):
+            os.makedirs(cache)
+        for atom_index,atom_pdos in enumerate(pdos):
+            for states,values in atom_pdos.items():
+                np.save(os.path.join(cache,'pdos_{}_{}.npy'.format(atom_index,states)),values)
+        np.save(os.path.join(cache,'total.npy'),dos_total)
+        np.save(stamp,dos_energies)   #written last: marks a complete cache
+    return cache
+
 class DOS_extract(object):
 
     def __init__(self,site,met,pathway):
@@ -281,6 +299,13 @@ class DOS_extract(object):
         self.pathway=pathway
         #index of active site
         self.atom_index=PM.site_dict[site]
+        #dos.pickle and the d band are loaded/integrated on first use and shared by all features
+        self._dos=None
+        self._d_band_center=None
+        self._moments=None
+        self._O2p_pdos=None
+        self._pdos_sums={}
+        self.channels=band_channels['spin' if met in spin_metals else 'nospin']
         # self.sum_pdos
     def dos_collect(self):
         """
@@ -291,19 +316,34 @@ class DOS_extract(object):
         - dos_total:   numbers of density states (x axis)
         - pdos: density state of each atom and each orbital
         """
-        with open('{}/dos.pickle'.format(self.pathway),"rb") as input_file:
-            dos_energies, dos_total, pdos = cPickle.load(input_file)
+        if self._dos is None:
+            #memory-mapped views of the .npy copy: only the pages of the atoms/states actually used are read
+            cache=dos_cache(self.pathway)
+            pdos={}
+            for fname in os.listdir(cache):
+                if fname.startswith('pdos_'):
+                    atom_index,states=fname[5:-4].split('_')
+                    pdos.setdefault(int(atom_index),{})[states]=np.load(os.path.join(cache,fname),mmap_mode='r')
+            self._dos = (np.load(os.path.join(cache,'energies.npy'),mmap_mode='r'),
+                         np.load(os.path.join(cache,'total.npy'),mmap_mode='r'), pdos)
+        dos_energies, dos_total, pdos = self._dos
         return dos_energies, dos_total, pdos
 
+    def _sum_pdos(self,atom_index,band):
+        """
+        Output:
+        - sum_pdos: pdos of atom_index summed over the band_channels columns of band ('s','p','d','eg','t2g'), kept per (atom, band)
+        """
+        key=(atom_index,band)
+        if key not in self._pdos_sums:
+            pdos=self.dos_collect()[2]
+            states = 'd' if band in ('eg','t2g') else band
+            self._pdos_sums[key] = np.asarray(pdos[atom_index][states])[list(self.channels[band])].sum(axis=0)
+        return self._pdos_sums[key]
+
     def Max_d_band(self):
-        pdos=self.dos_collect()[2]
         dos_energies=self.dos_collect()[0]
-
-        states = 'd'
-        if  self.met == 'Ni' or self.met == 'Fe' or self.met == 'Co':
-		    sum_pdos = pdos[self.atom_index][states][0] + pdos[self.atom_index][states][1]
-        else:
-		    sum_pdos = pdos[self.atom_index][states][0] 
+        sum_pdos=self._sum_pdos(self.atom_index,'d')
         #find the index of maximum value
         max_index=np.where(sum_pdos == np.amax(sum_pdos))
         Max_d_energy= dos_energies[max_index]
@@ -319,45 +359,57 @@ class DOS_extract(object):
         - sef.sum_pdos: global variable
         - dbc : d band center
         """
+        if self._d_band_center is not None:
+            return self._d_band_center
         dbc=0
-        pdos=self.dos_collect()[2]
         dos_energies=self.dos_collect()[0]
         #collect dos
-        states = 'd'
         #contains total pdos projected onto states (spin up infirst column, spin down in second column) followed by m-resolved pdos in following columns.
-        if  self.met == 'Ni' or self.met == 'Fe' or self.met == 'Co':
-		    sum_pdos = pdos[self.atom_index][states][0] + pdos[self.atom_index][states][1]
-        else:
-		    sum_pdos = pdos[self.atom_index][states][0] 
-        dbc = simps(sum_pdos*dos_energies,dos_energies) / simps(sum_pdos,dos_energies)
+        sum_pdos=self._sum_pdos(self.atom_index,'d')
+        #int(sum_pdos*E**k) for k=0..4 in one stacked simpson call; width, skewness and kurtosis are derived from them
+        self._moments = tuple(simpson(sum_pdos*np.power.outer(dos_energies,np.arange(5)).T,x=dos_energies))
+        m0,m1 = self._moments[:2]
+        dbc = m1 / m0
         #plt.plot(dos_energies,sum_pdos)
         #plt.show()
-        return round(dbc,4), sum_pdos
+        self._d_band_center = round(dbc,4), sum_pdos
+        return self._d_band_center
         
+    def _d_moments(self):
+        """
+        Output:
+        - m0..m4: int(sum_pdos*E**k) of the d band for k=0..4 (computed by D_band_center)
+        """
+        if self._moments is None:
+            self.D_band_center()
+        return self._moments
+
+    def _d_central_moments(self):
+        """
+        Output:
+        - dbc, mom2, mom3, mom4: d band center and normalised central moments int(sum_pdos*(E-dbc)**k)/int(sum_pdos),
+          expanded from the raw moments so no (E-dbc)**k array is built
+        """
+        m0,m1,m2,m3,m4 = [m/self._d_moments()[0] for m in self._d_moments()]
+        dbc = m1
+        mom2 = m2 - dbc**2
+        mom3 = m3 - 3*dbc*m2 + 2*dbc**3
+        mom4 = m4 - 4*dbc*m3 + 6*dbc**2*m2 - 3*dbc**4
+        return dbc, mom2, mom3, mom4
+
     def D_band_width(self):
-        sum_pdos=self.D_band_center()[1]
-        dos_energies=self.dos_collect()[0]
-        dbc=self.D_band_center()[0]
-        d_band_mom2 = simps(sum_pdos*np.power(dos_energies-dbc,2),dos_energies)/simps(sum_pdos,dos_energies)
+        d_band_mom2 = self._d_central_moments()[1]
         dbw=np.sqrt(d_band_mom2)
         return round(dbw,4)
     
     def D_band_skewness(self):
-        sum_pdos=self.D_band_center()[1]
-        dos_energies=self.dos_collect()[0]
-        dbc=self.D_band_center()[0]
-        dbw=self.D_band_width()
-        d_band_mom3 = simps(sum_pdos*np.power(dos_energies-dbc,3),dos_energies)/simps(sum_pdos,dos_energies)
-        dbs=d_band_mom3/np.power(dbw,3)
+        dbc, d_band_mom2, d_band_mom3 = self._d_central_moments()[:3]
+        dbs=d_band_mom3/np.power(d_band_mom2,1.5)
         return round(dbs,4)
 
     def D_band_kutosis(self):
-        sum_pdos=self.D_band_center()[1]
-        dos_energies=self.dos_collect()[0]
-        dbc=self.D_band_center()[0]
-        dbw=self.D_band_width()
-        d_band_mom4 = simps(sum_pdos*np.power(dos_energies-dbc,3),dos_energies)/simps(sum_pdos,dos_energies)
-        dbk=d_band_mom4/np.power(dbw,4)
+        dbc, d_band_mom2, d_band_mom3, d_band_mom4 = self._d_central_moments()
+        dbk=d_band_mom4/np.power(d_band_mom2,2)
         return round(dbk,4)
 
     def D_band_filling(self):
@@ -366,19 +418,14 @@ class DOS_extract(object):
         - dbf: d occupied filling
         - fraction: the fraction of unoccupied orbital / entire orbital
         """
-        filled_pdos = []
-        filled_dos_energies = []
         dos_energies=self.dos_collect()[0]
         sum_pdos=self.D_band_center()[1]
 
-        for d,e in zip(sum_pdos,dos_energies):
-			if e < 0:
-			    filled_pdos.append(d)
-			    filled_dos_energies.append(e)
+        filled = dos_energies < 0
         #d occupied filling
-        dbf = simps(filled_pdos,filled_dos_energies)
+        dbf = simpson(sum_pdos[filled],x=dos_energies[filled])
         #fraction of unoccupied filling
-        dbf_entire = simps(sum_pdos,dos_energies)
+        dbf_entire = simpson(sum_pdos,x=dos_energies)
         fraction= 1. - (dbf/dbf_entire)
         return round(dbf,4),  round(fraction,4)
 
@@ -387,68 +434,39 @@ class DOS_extract(object):
         dos_energies=self.dos_collect()[0]
 
         #define the region  energy > 0
-        dos_energies_un=np.array([])
-        sum_pdos_un=np.array([])
-        for d,e in zip(sum_pdos,dos_energies):
-            if e < 0:
-                continue
-            else:
-                sum_pdos_un = np.append(sum_pdos_un, np.array([d]))
-                dos_energies_un = np.append(dos_energies_un, np.array([e]))
+        unfilled = dos_energies >= 0
+        sum_pdos_un = sum_pdos[unfilled]
+        dos_energies_un = dos_energies[unfilled]
         
-        d_un_band_center=simps(sum_pdos_un*dos_energies_un,dos_energies_un) / simps(sum_pdos_un,dos_energies_un)
+        d_un_band_center=simpson(sum_pdos_un*dos_energies_un,x=dos_energies_un) / simpson(sum_pdos_un,x=dos_energies_un)
         return round(d_un_band_center,4)
 
     def Eg_band_center(self):
-        pdos=self.dos_collect()[2]
         dos_energies=self.dos_collect()[0]
-
-        states = 'd'
-        if self.met == 'Ni' or self.met == 'Fe' or self.met == 'Co':
-            sum_pdos = ( pdos[self.atom_index][states][2]  + pdos[self.atom_index][states][3]
-                        +pdos[self.atom_index][states][10] + pdos[self.atom_index][states][11] )        
-        else:
-            sum_pdos = pdos[self.atom_index][states][1] + pdos[self.atom_index][states][5]
-        eg_band_center = simps(sum_pdos*dos_energies,dos_energies) / simps(sum_pdos,dos_energies)
+        sum_pdos=self._sum_pdos(self.atom_index,'eg')
+        eg_band_center = simpson(sum_pdos*dos_energies,x=dos_energies) / simpson(sum_pdos,x=dos_energies)
         return round(eg_band_center,4), sum_pdos
 
     def Eg_band_filling(self):
-        filled_pdos = []
-        filled_dos_energies = []
         sum_pdos = self.Eg_band_center()[1]
         dos_energies=self.dos_collect()[0]
 
-        for d,e in zip(sum_pdos,dos_energies):
-            if e < 0:
-                filled_pdos.append(d)
-                filled_dos_energies.append(e)
-        eg_band_filling = simps(filled_pdos,filled_dos_energies)
+        filled = dos_energies < 0
+        eg_band_filling = simpson(sum_pdos[filled],x=dos_energies[filled])
         return round(eg_band_filling,4)
 
     def T2g_band_center(self):
-        pdos=self.dos_collect()[2]
         dos_energies=self.dos_collect()[0]
-
-        states = 'd'
-        if self.met == 'Ni' or self.met == 'Fe' or self.met == 'Co':
-            sum_pdos = ( pdos[self.atom_index][states][4] + pdos[self.atom_index][states][5] + pdos[self.atom_index][states][6] 
-                       + pdos[self.atom_index][states][7] + pdos[self.atom_index][states][8] + pdos[self.atom_index][states][9] )
-        else:
-            sum_pdos = pdos[self.atom_index][states][2] + pdos[self.atom_index][states][3] + pdos[self.atom_index][states][4]
-        T2g_band_center = simps(sum_pdos*dos_energies,dos_energies) / simps(sum_pdos,dos_energies)
+        sum_pdos=self._sum_pdos(self.atom_index,'t2g')
+        T2g_band_center = simpson(sum_pdos*dos_energies,x=dos_energies) / simpson(sum_pdos,x=dos_energies)
         return round(T2g_band_center,4), sum_pdos
 
     def T2g_band_filling(self):
-        filled_pdos = []
-        filled_dos_energies = []
         sum_pdos = self.T2g_band_center()[1]
         dos_energies=self.dos_collect()[0]
 
-        for d,e in zip(sum_pdos,dos_energies):
-            if e < 0:
-                filled_pdos.append(d)
-                filled_dos_energies.append(e)
-        T2g_band_filling = simps(filled_pdos,filled_dos_energies)
+        filled = dos_energies < 0
+        T2g_band_filling = simpson(sum_pdos[filled],x=dos_energies[filled])
         return round(T2g_band_filling,4)
     
     def Dos_fermi(self):
@@ -458,97 +476,46 @@ class DOS_extract(object):
         d_dos_EF = 0
         sp_dos_EF = 0
         dos_energies=self.dos_collect()[0]
-        pdos=self.dos_collect()[2]
 
-        states = 'd'
-        if self.met == 'Ni' or self.met == 'Fe' or self.met == 'Co':
-            sum_pdos = pdos[self.atom_index][states][0] + pdos[self.atom_index][states][1]
-        else:
-            sum_pdos = pdos[self.atom_index][states][0]
-        EF_pdos = []
-        for e,d in zip(dos_energies,sum_pdos):
-            if Emin < e < Emax:
-                EF_pdos.append(d)
-        d_dos_EF= np.average(EF_pdos)
-
-        states = 's'
-        if self.met == 'Ni' or self.met == 'Fe' or self.met == 'Co':
-            s_pdos = pdos[self.atom_index][states][0] + pdos[self.atom_index][states][1]
-        else:
-            s_pdos = pdos[self.atom_index][states][0]
-        states = 'p'
-        if self.met == 'Ni' or self.met == 'Fe' or self.met == 'Co':
-            p_pdos = pdos[self.atom_index][states][0] + pdos[self.atom_index][states][1]
-        else:
-            p_pdos = pdos[self.atom_index][states][0]
+        sum_pdos=self._sum_pdos(self.atom_index,'d')
+        near_EF = (dos_energies > Emin) & (dos_energies < Emax)
+        d_dos_EF= np.average(sum_pdos[near_EF])
+
+        s_pdos=self._sum_pdos(self.atom_index,'s')
+        p_pdos=self._sum_pdos(self.atom_index,'p')
         sp_pdos = s_pdos + p_pdos
-        sp_EF_pdos = []
-        for e,d in zip(dos_energies,sp_pdos):
-            if Emin < e < Emax:
-                sp_EF_pdos.append(d)
-        sp_dos_EF = np.average(sp_EF_pdos)
+        sp_dos_EF = np.average(sp_pdos[near_EF])
         return round(d_dos_EF + sp_dos_EF, 4)
 
+    def O2p_pdos(self):
+        """
+        Output:
+        - psum_pdos: p pdos of the oxygens in PM.O_site_dict[site], one row per atom (spin channels summed)
+        """
+        if self._O2p_pdos is None:
+            self._O2p_pdos = np.array([self._sum_pdos(atom_index,'p') for atom_index in PM.O_site_dict[self.site]])
+        return self._O2p_pdos
+
     def O2p_band_center(self):
-        p_band_center = 0
-        pdos=self.dos_collect()[2]
+        psum_pdos=self.O2p_pdos()
         dos_energies=self.dos_collect()[0]
-        n_atoms=len(PM.O_site_dict[self.site])
-        for atom_index in PM.O_site_dict[self.site]:
-            states='p'
-            if self.met == 'Ni' or self.met == 'Fe' or self.met == 'Co':
-                psum_pdos = pdos[atom_index][states][0] + pdos[atom_index][states][1]
-            else:
-                psum_pdos = pdos[atom_index][states][0]
-            pdos_collect = []
-            pdos_energies_collect = []
-            for d,e in zip(psum_pdos,dos_energies):
-                pdos_collect=np.append(pdos_collect,np.array([d]))
-                pdos_energies_collect=np.append(pdos_energies_collect,np.array([e]))
-            pbc = simps(pdos_collect*pdos_energies_collect,pdos_energies_collect) / simps(pdos_collect,pdos_energies_collect)
-            p_band_center += pbc        
-        p_band_center = p_band_center/n_atoms
+        pbc = simpson(psum_pdos*dos_energies,x=dos_energies,axis=1) / simpson(psum_pdos,x=dos_energies,axis=1)
+        p_band_center = pbc.mean()
         return round(p_band_center,4)
 
     def O2p_band_filling(self):
-        p_band_filling=0
-        pdos=self.dos_collect()[2]
+        psum_pdos=self.O2p_pdos()
         dos_energies = self.dos_collect()[0]
-        n_atoms=len(PM.O_site_dict[self.site])
-        
-        for atom_index in PM.O_site_dict[self.site]:
-            states='p'
-            if self.met == 'Ni' or self.met == 'Fe' or self.met == 'Co':
-                psum_pdos = pdos[atom_index][states][0] + pdos[atom_index][states][1]
-            else:
-                psum_pdos = pdos[atom_index][states][0]
-            pfilled_pdos = []
-            pfilled_dos_energies = []
-            for d,e in zip(psum_pdos, dos_energies):
-                if e < 0:
-                    pfilled_pdos.append(d)
-                    pfilled_dos_energies.append(e)
-            pbf=(simps(pfilled_pdos,pfilled_dos_energies))
-            p_band_filling += pbf
-        p_band_filling = p_band_filling/n_atoms
+        filled = dos_energies < 0
+        pbf = simpson(psum_pdos[:,filled],x=dos_energies[filled],axis=1)
+        p_band_filling = pbf.mean()
         return round(p_band_filling,4)
 
     def Max_2p_band(self):
-        Max_2p_band=0
-        pdos=self.dos_collect()[2]
+        psum_pdos=self.O2p_pdos()
         dos_energies = self.dos_collect()[0]
-        n_atoms=len(PM.O_site_dict[self.site])
-
-        for atom_index in PM.O_site_dict[self.site]:
-            states='p'
-            if self.met == 'Ni' or self.met == 'Fe' or self.met == 'Co':
-                psum_pdos = pdos[atom_index][states][0] + pdos[atom_index][states][1]
-            else:
-                psum_pdos = pdos[atom_index][states][0]
-            max_index=np.where(psum_pdos == np.amax(psum_pdos))
-            Max_2p_energy= dos_energies[max_index]
-            Max_2p_band += float(Max_2p_energy[0])
-        Max_2p_band = Max_2p_band/n_atoms
+        #argmax gives the first maximum of each atom, as np.where(...)[0] did
+        Max_2p_band = dos_energies[psum_pdos.argmax(axis=1)].mean()
         #plt.plot(dos_energies,psum_pdos)
         #plt.show()
         return round(Max_2p_band,4)
@@ -557,22 +524,8 @@ class DOS_extract(object):
         Eint = 0.1
         Emin = -Eint
         Emax = Eint
-        O2p_dos_EF = 0
         dos_energies=self.dos_collect()[0]
-        pdos=self.dos_collect()[2]
-        n_atoms=len(PM.O_site_dict[self.site])
-        for atom_index in PM.O_site_dict[self.site]:
-            states='p'
-            if self.met == 'Ni' or self.met == 'Fe' or self.met == 'Co':
-                psum_pdos = pdos[atom_index][states][0] + pdos[atom_index][states][1]
-            else:
-                psum_pdos = pdos[atom_index][states][0]
-            O2p_EF_collect=[]
-            for e,d in zip(dos_energies,psum_pdos):
-                if Emin < e < Emax:
-                    O2p_EF_collect.append(d)
-            aver_EF= np.average(O2p_EF_collect)
-            O2p_dos_EF += aver_EF
-        O2p_dos_EF = O2p_dos_EF/n_atoms
+        psum_pdos=self.O2p_pdos()
+        near_EF = (dos_energies > Emin) & (dos_energies < Emax)
+        O2p_dos_EF = psum_pdos[:,near_EF].mean(axis=1).mean()
         return round(O2p_dos_EF,4)
-
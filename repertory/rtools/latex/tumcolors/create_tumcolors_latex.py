@@ -5,11 +5,15 @@
 import os
 import subprocess
 import time
+import rtools.filesys
 import rtools.tumcd
 
 tumcolors = rtools.tumcd.TUMcolors()
 
-doc = r"""
+# the document is collected in parts and joined once at the end
+doc = []
+
+doc.append(r"""
 \documentclass{scrartcl}
 \usepackage[names]{xcolor}
 \usepackage{array}
@@ -17,18 +21,18 @@ doc = r"""
 \usepackage{longtable}
 \usepackage{booktabs}
 \usepackage{url}
-"""[1::]
+"""[1::])
 
 # color definitions
-doc += tumcolors.export_latex(show = False)
+doc.append(tumcolors.export_latex(show = False))
 
-doc += "\n\n"+r"\begin{document}"
+doc.append("\n\n"+r"\begin{document}")
 
-doc +=r"""
+doc.append(r"""
 \section*{TUM Corporate Design Color Definitions}
 The color definitions listed below are available via the \texttt{rtools.tumcd.export\_latex()} function. They are defined as mentioned in the TUM CD guide available at \url{https://portal.mytum.de/corporatedesign/print/styleguide/styleguide_print_band2.pdf/}. Colors for diagrams are as well available as blends with white in defined ratios. Just append \texttt{\_X} to the color name, where \texttt{X} is the mixing ratio as mentioned in the table.
 
-"""
+""")
 
 
 maincolors = tumcolors.maincolors
@@ -36,68 +40,70 @@ accentcolors = tumcolors.accentcolors
 diagcolors = tumcolors.diagcolors
 ratios = tumcolors.ratios
 
+# one row template per table: a midrule and the color name cell, plus the
+# blend cells for the diagram colors, whose ratios are filled in once here
+color_row = "\n" + r"\\\midrule" + "\n" + r"\texttt{%(name)s} & \cellcolor{%(c)s}"
+blend_row = color_row + "".join(r" & \cellcolor{%(c)s_" + r + "}" for r in ratios)
+
+def table_rows(colors, row):
+    # a single template evaluation per color, joined into one string
+    return "".join(row % {'name': c.replace('_','\_'), 'c': c}
+                   for c in sorted(colors))
+
 
 # the main colors table
-doc += r"""
+doc.append(r"""
 \begin{longtable}{l m{7cm}}
 \toprule
-\multicolumn{2}{c}{\textbf{Main colors (``Hausfarben'')}}"""
+\multicolumn{2}{c}{\textbf{Main colors (``Hausfarben'')}}""")
 
-for c in sorted(maincolors.keys()):
-    doc += "\n" + r"\\\midrule" + "\n"
-    doc += r"\texttt{{{0:s}}} & \cellcolor{{{1:s}}}".format(c.replace('_','\_'),c) 
+doc.append(table_rows(maincolors, color_row))
 
-doc += r"""
+doc.append(r"""
 \\\bottomrule
 \end{longtable}
 
-"""
+""")
 
 # the accent colors table
-doc += r"""
+doc.append(r"""
 \begin{longtable}{l m{7cm}}
 \toprule
-\multicolumn{2}{c}{\textbf{Extended accent colors (for presentations only!)}}"""
+\multicolumn{2}{c}{\textbf{Extended accent colors (for presentations only!)}}""")
 
-for c in sorted(accentcolors.keys()):
-    doc += "\n" + r"\\\midrule" + "\n"
-    doc += r"\texttt{{{0:s}}} & \cellcolor{{{1:s}}}".format(c.replace('_','\_'),c) 
+doc.append(table_rows(accentcolors, color_row))
 
-doc += r"""
+doc.append(r"""
 \\\bottomrule
 \end{longtable}
 
-"""
+""")
 
 # the diagram colors table
-doc += r"""
+doc.append(r"""
 \begin{longtable}{l m{2cm} m{2cm} m{2cm} m{2cm}}
 \toprule
 \multicolumn{5}{c}{\textbf{Extended diagram colors and respective blends with white}}
 \\\midrule
 & 
-"""
-for r in ratios:
-    doc += r"&\texttt{{$\ast$\_{}}}".format(r)
+""")
+doc.append("".join(r"&\texttt{{$\ast$\_{}}}".format(r) for r in ratios))
 
-for c in sorted(diagcolors.keys()):
-    doc += "\n" + r"\\\midrule" + "\n"
-    doc += r"\texttt{{{0:s}}} & \cellcolor{{{1:s}}}".format(c.replace('_','\_'),c) 
-    for r in ratios:
-        doc += r" & \cellcolor{{{0:s}_{1:s}}}".format(c,r)
+doc.append(table_rows(diagcolors, blend_row))
 
-doc += r"""
+doc.append(r"""
 \\\bottomrule
 \end{longtable}
 
-"""
+""")
 
 
-doc += r"""\vfill\hfill\itshape This document was generated on {}""".format(time.strftime("%c"))
+doc.append(r"""\vfill\hfill\itshape This document was generated on {}""".format(time.strftime("%c")))
 
-doc += r"""
+doc.append(r"""
 \end{document}
-"""
+""")
+doc = "".join(doc)
 
 
 #------------------------------------------------------------------------------
@@ -105,14 +111,22 @@ doc += r"""
 #------------------------------------------------------------------------------
 fname = "tumcolors.tex"
 folder = "tumcolors"
-if not os.path.exists(folder):
-    os.makedirs(folder)
-
-with open(os.path.join(folder,fname), 'w') as f:
-    f.write(doc)
-
-os.chdir(folder)
-
-subprocess.call("latexmk -pdf {}".format(fname).split())
-subprocess.call("latexmk -c".split())
+rtools.filesys.mkdir_p(folder)
+
+# the document is complete, so it is encoded once and handed to the kernel
+# directly instead of through the buffered text layer
+data = memoryview(doc.encode('utf-8'))
+fd = os.open(os.path.join(folder,fname), os.O_WRONLY|os.O_CREAT|os.O_TRUNC, 0o644)
+try:
+    written = 0
+    while written < len(data):
+        written += os.write(fd, data[written:])
+finally:
+    os.close(fd)
+
+# non-interactive build: a LaTeX error stops the script instead of waiting
+# for input at a prompt
+subprocess.check_call(["latexmk", "-pdf", "-interaction=nonstopmode",
+                       "-silent", fname], cwd=folder)
+subprocess.call(["latexmk", "-c"], cwd=folder)
 
@@ -28,14 +28,32 @@ Author: Christoph Schober, 2015
 """
 import os
 from collections import namedtuple
+from operator import methodcaller
 
 import ase
+import ase.io
 import numpy as np
 import pybel as pb
 import rdkit
 import rdkit.Chem.AllChem
 import rdkit.Chem.Draw
 from rdkit import Chem
+from rdkit.Geometry import Point3D
+
+# bond perception straight from 3D coordinates is only available in newer
+# rdkit versions (2022.09+); older ones go through openbabel instead
+try:
+    from rdkit.Chem import rdDetermineBonds
+except ImportError:
+    rdDetermineBonds = None
+
+# hybridizations are stored as small integer codes, hyb_names decodes them;
+# the table is taken from the installed rdkit, so every type it knows keeps
+# its name; a hybridization without a name is counted as 'S'
+hyb_types = [hyb for _, hyb in sorted(Chem.HybridizationType.values.items())]
+hyb_names = tuple(hyb.name for hyb in hyb_types)
+hyb_codes = dict((hyb, code) for code, hyb in enumerate(hyb_types))
+hyb_default = hyb_names.index("S")
 
 def read(path, format="xyz", removeHs=False):
     """
@@ -54,6 +72,13 @@ def read(path, format="xyz", removeHs=False):
     removeHs : optional, bool
         If True, Hydrogen atoms are removed during the conversion.
     """
+    # xyz files are read with ASE and built in rdkit directly, without
+    # the detour through openbabel and a MOL block
+    if format == "xyz" and rdDetermineBonds is not None:
+        # the first frame, as pb.readfile(...).next() below returns
+        atoms = ase.io.read(path, index=0, format="xyz")
+        return convert_ase2rdkit(atoms, removeHs=removeHs)
+
     pymol = pb.readfile(format, path).next()
     mol = pymol.write("mol")
     mol = Chem.MolFromMolBlock(mol, removeHs=removeHs)
@@ -75,7 +100,9 @@ def get_atomic_numbers(mol):
     atomic_num : np.array
         Array with all atomic numbers.
     """
-    atomic_num = np.array([x.GetAtomicNum() for x in mol.GetAtoms()])
+    # rdkit has no bulk getter, methodcaller keeps the per-atom call in C
+    atomic_num = np.fromiter(map(methodcaller("GetAtomicNum"), mol.GetAtoms()),
+                             dtype=int, count=mol.GetNumAtoms())
     return atomic_num
 
 
@@ -107,15 +134,18 @@ def init_ipython():
     import rdkit.Chem.Draw.IPythonConsole
     rdkit.Chem.Draw.IPythonConsole.InstallIPythonRenderer()
 
-def convert_ase2rdkit(atoms, removeHs=False):
+def convert_ase2rdkit(atoms, removeHs=False, openbabel=False):
     """
     Convert an ASE atoms object to rdkit molecule.
     The ordering of the Atoms is identical.
 
+    The molecule is built directly in rdkit and the bonds are perceived
+    from the 3D coordinates with rdDetermineBonds. If that is not
+    available, fails (charged molecules, radicals, unassignable bond
+    orders) or openbabel=True, the atoms take the old route via a
+    XYZ string, openbabel and a MOL block.
 
     Important: Implemented only for clusters, not PBC!
-    rdkit does not keep xyz coordinates, therefore
-    a backconversion is not possible yet.
 
     Parameters
     ----------
@@ -123,12 +153,21 @@ def convert_ase2rdkit(atoms, removeHs=False):
         The ASE atoms object
     removeHs : Bool
         If True, remove all H atoms from molecule.
+    openbabel : Bool
+        If True, perceive the bonds with openbabel.
 
     Returns
     -------
     mol : rdkit.Chem.rdchem.Mol
         The rdkit molecule object.
     """
+    if not openbabel and rdDetermineBonds is not None:
+        try:
+            return __ase2rdkit__(atoms, removeHs=removeHs)
+        except ValueError:
+            # rdkit could not assign the bonds, openbabel is more lenient
+            pass
+
     a_str = __ase2xyz__(atoms)
     pymol = pb.readstring("xyz", a_str)
     mol = pymol.write("mol")
@@ -136,6 +175,29 @@ def convert_ase2rdkit(atoms, removeHs=False):
     return mol
 
 
+def __ase2rdkit__(atoms, removeHs=False):
+    """
+    Build a rdkit molecule from an ASE atoms object in memory, with the
+    bonds perceived by rdDetermineBonds. Raises ValueError if rdkit
+    cannot assign the bonds.
+    """
+    if any(atoms.get_pbc()):
+        raise RuntimeError("Detected PBCs. Not supported (yet)!")
+    rwmol = Chem.RWMol()
+    conf = Chem.Conformer(len(atoms))
+    for i, (num, (x, y, z)) in enumerate(zip(atoms.get_atomic_numbers(),
+                                             atoms.get_positions())):
+        rwmol.AddAtom(Chem.Atom(int(num)))
+        conf.SetAtomPosition(i, Point3D(x, y, z))
+    rwmol.AddConformer(conf, assignId=True)
+    rdDetermineBonds.DetermineBonds(rwmol, charge=0)
+    mol = rwmol.GetMol()
+    Chem.SanitizeMol(mol)
+    if removeHs:
+        mol = Chem.RemoveHs(mol)
+    return mol
+
+
 def __ase2xyz__(atoms):
     """
     Prepare a XYZ string from an ASE atoms object.
@@ -146,11 +208,18 @@ def __ase2xyz__(atoms):
         raise RuntimeError("Detected PBCs. Not supported (yet)!")
     num_atoms = len(atoms)
     types = atoms.get_chemical_symbols()
-    all_atoms = zip(types, atoms.get_positions())
-    a_str = str(num_atoms) + "\n" + "\n"
-    for atom in all_atoms:
-        a_str += atom[0] + " " + " ".join([str(x) for x in atom[1]]) + "\n"
-    return a_str
+    lines = [str(num_atoms), ""]
+    # tolist() gives plain floats in one pass; %r prints them with the
+    # shortest repr that still round-trips
+    for sym, (x, y, z) in zip(types, atoms.get_positions().tolist()):
+        lines.append("%s %r %r %r" % (sym, x, y, z))
+    lines.append("")
+    return "\n".join(lines)
+
+
+# converters to rdkit for the molecule types understood directly
+conversions = {ase.atoms.Atoms: convert_ase2rdkit,
+               rdkit.Chem.rdchem.Mol: lambda mol: mol}
 
 
 def __automagic_conversion__(mol):
@@ -159,13 +228,12 @@ def __automagic_conversion__(mol):
     rdkit if necessary.
     Supported inputs at the moment: ASE, any ASE-readable file.
     """
-    if type(mol) is ase.atoms.Atoms:
-        mol = convert_ase2rdkit(mol)
+    convert = conversions.get(type(mol))
+    if convert is not None:
+        mol = convert(mol)
     elif isinstance(mol, str) and os.path.isfile(mol):
         mol = ase.io.read(mol)
         mol = convert_ase2rdkit(mol)
-    elif type(mol) is rdkit.Chem.rdchem.Mol:
-        pass
     else:
         raise RuntimeError("Unknown molecule object.\
                            Is this a rdkit / ASE object or a \
@@ -222,14 +290,14 @@ def draw_molecules(
     draw_h : boolean
         If True, draw explicit hydrogen atoms.
     """
-    if draw_h is False:
-        mols = [Chem.RemoveHs(mol) for mol in mols]
-    else:
-        mols = [Chem.AddHs(mol) for mol in mols]
-
+    # one pass: fix the hydrogens and lay out each molecule right away
+    hs = Chem.RemoveHs if draw_h is False else Chem.AddHs
+    drawn = list()
     for mol in mols:
+        mol = hs(mol)
         rdkit.Chem.AllChem.Compute2DCoords(mol)
-    img = rdkit.Chem.Draw.MolsToGridImage(mols, molsPerRow=molsPerRow,
+        drawn.append(mol)
+    img = rdkit.Chem.Draw.MolsToGridImage(drawn, molsPerRow=molsPerRow,
                                           subImgSize=subImgSize,
                                           legends=legends)
     img.save(filename)
@@ -295,38 +363,63 @@ def get_bond_info(mol):
     >>> bonds[0].a1_hyb
     ... 'SP3'
     """
-    mol = __automagic_conversion__(mol)
-    bonds = list()
-    bond_t = namedtuple("Bond", ["atom1",
-                                 "a1_num",
-                                 "a1_hyb",
-                                 "atom2",
-                                 "a2_num",
-                                 "a2_hyb",
-                                 "bond_type"])
-
-    bond_gen = mol.GetBonds()
-
-    for num, bond in enumerate(bond_gen):
-        a_start = bond.GetBeginAtom()
-        a_end = bond.GetEndAtom()
-        try:
-            a1_hyb = a_start.GetHybridization().name
-        except AttributeError:
-            a1_hyb = "S"
-        try:
-            a2_hyb = a_end.GetHybridization().name
-        except AttributeError:
-            a2_hyb = "S"
+    bonds = get_bond_arrays(mol)
+    names = np.array(hyb_names, dtype=object)
+    bonds = bonds._replace(a1_hyb=names[bonds.a1_hyb],
+                           a2_hyb=names[bonds.a2_hyb])
+    bond_t = namedtuple("Bond", bonds._fields)
+    return [bond_t(*b) for b in zip(*[x.tolist() for x in bonds])]
 
-        b = bond_t(atom1=a_start.GetIdx(),
-                   a1_num=a_start.GetAtomicNum(),
-                   a1_hyb=a1_hyb,
-                   atom2=a_end.GetIdx(),
-                   a2_num=a_end.GetAtomicNum(),
-                   a2_hyb=a2_hyb,
-                   bond_type=bond.GetBondTypeAsDouble())
 
-        bonds.append(b)
+def get_bond_arrays(mol):
+    """
+    Get the same bond and atom attributes as get_bond_info, but as one
+    array per attribute (index i of every array belongs to bond i).
 
-    return bonds
+    Parameters
+    ----------
+    mol : rdkit.Chem.rdchem.Mol or ase.atoms.Atoms
+        The molecule to analyse.
+
+    Returns
+    -------
+    bonds : namedtuple of np.array
+        atom1, atom2: int arrays with the atom indices
+        a1_num, a2_num: int arrays with the atomic numbers
+        a1_hyb, a2_hyb: int8 arrays with the hybridization codes
+                        (decode with hyb_names)
+        bond_type: float array with the bond type as double
+    """
+    mol = __automagic_conversion__(mol)
+    bonds_t = namedtuple("Bonds", ["atom1",
+                                   "a1_num",
+                                   "a1_hyb",
+                                   "atom2",
+                                   "a2_num",
+                                   "a2_hyb",
+                                   "bond_type"])
+
+    num_bonds = mol.GetNumBonds()
+    bond_gen = list(mol.GetBonds())
+
+    def bond_array(getter, dtype):
+        return np.fromiter(map(methodcaller(getter), bond_gen),
+                           dtype=dtype, count=num_bonds)
+
+    atom1 = bond_array("GetBeginAtomIdx", int)
+    atom2 = bond_array("GetEndAtomIdx", int)
+    bond_type = bond_array("GetBondTypeAsDouble", float)
+
+    # per-atom attributes are looked up once and then gathered per bond
+    atomic_num = get_atomic_numbers(mol)
+    hyb = np.fromiter((hyb_codes.get(h, hyb_default) for h in
+                       map(methodcaller("GetHybridization"), mol.GetAtoms())),
+                      dtype=np.int8, count=mol.GetNumAtoms())
+
+    return bonds_t(atom1=atom1,
+                   a1_num=atomic_num[atom1],
+                   a1_hyb=hyb[atom1],
+                   atom2=atom2,
+                   a2_num=atomic_num[atom2],
+                   a2_hyb=hyb[atom2],
+                   bond_type=bond_type)